@@ -0,0 +1,142 @@
+"""
+Numba compiled kernels for the per-frame pupil tracking hot path
+"""
+import math
+
+from numba import njit, prange, void, boolean, uint8, int32, int64, float64
+
+
+# Thresholds the gray frame at three levels above the darkest pixel value and masks
+# everything outside a square around the pupil center, in a single pass over the frame.
+# Equivalent to apply_binary_threshold (THRESH_BINARY_INV) followed by mask_outside_square
+# for each level, without the five intermediate arrays.
+# Compiled eagerly for any-layout arrays (the tracker passes crops of its buffers), so the
+# first frame never waits on the JIT and the compiled code is reused from the on-disk cache.
+@njit(void(uint8[:, :], int64, int64, int64, int64, int64, int64, int64, uint8[:, :], uint8[:, :], uint8[:, :]),
+      parallel=True, fastmath=True, cache=True)
+def fused_threshold3(gray, center_x, center_y, darkest_value, half_size,
+                     offset_strict, offset_medium, offset_relaxed,
+                     out_strict, out_medium, out_relaxed):
+    h, w = gray.shape
+
+    # Same square bounds as mask_outside_square (upper bound exclusive)
+    x0 = max(0, center_x - half_size)
+    y0 = max(0, center_y - half_size)
+    x1 = min(w, center_x + half_size)
+    y1 = min(h, center_y + half_size)
+
+    thresh_strict = darkest_value + offset_strict
+    thresh_medium = darkest_value + offset_medium
+    thresh_relaxed = darkest_value + offset_relaxed
+
+    for y in prange(h):
+        row_in_square = y0 <= y < y1
+        for x in range(w):
+            if row_in_square and x0 <= x < x1:
+                v = gray[y, x]
+                out_strict[y, x] = 255 if v <= thresh_strict else 0
+                out_medium[y, x] = 255 if v <= thresh_medium else 0
+                out_relaxed[y, x] = 255 if v <= thresh_relaxed else 0
+            else:
+                out_strict[y, x] = 0
+                out_medium[y, x] = 0
+                out_relaxed[y, x] = 0
+
+
+# Index of the largest contour with area >= min_area whose bounding box side ratio is <= max_ratio, or -1.
+# Same selection as EyeTrackerUtils.filter_contours_by_area_and_return_largest, with cv2.contourArea
+# (shoelace) and cv2.boundingRect computed inline. The contours are passed concatenated as one
+# (n, 2) point array, contour k being points[bounds[k]:bounds[k + 1]].
+@njit(int64(int32[:, ::1], int64[::1], float64, float64), cache=True, nogil=True)
+def largest_contour_index(points, bounds, min_area, max_ratio):
+    best_index = -1
+    best_area = 0.0
+
+    for k in range(bounds.shape[0] - 1):
+        start = bounds[k]
+        end = bounds[k + 1]
+
+        # Shoelace area over the closed polygon
+        twice_area = 0.0
+        prev_x = points[end - 1, 0]
+        prev_y = points[end - 1, 1]
+        for i in range(start, end):
+            x = points[i, 0]
+            y = points[i, 1]
+            twice_area += float(prev_x) * y - float(x) * prev_y
+            prev_x = x
+            prev_y = y
+        area = abs(twice_area) * 0.5
+        # Too small, or cannot beat the best one so far, either way the ratio test is not needed
+        if area < min_area or area <= best_area:
+            continue
+
+        # Bounding box, boundingRect counts both end pixels
+        min_x = max_x = points[start, 0]
+        min_y = max_y = points[start, 1]
+        for i in range(start + 1, end):
+            x = points[i, 0]
+            y = points[i, 1]
+            if x < min_x:
+                min_x = x
+            elif x > max_x:
+                max_x = x
+            if y < min_y:
+                min_y = y
+            elif y > max_y:
+                max_y = y
+        w = max_x - min_x + 1
+        h = max_y - min_y + 1
+
+        if max(w, h) / min(w, h) <= max_ratio:
+            best_area = area
+            best_index = k
+
+    return best_index
+
+
+# Marks the contour points kept by EyeTrackerUtils.optimize_contours_by_angle_vectorised in out_mask,
+# same filter in one pass without the per step temporaries: both neighbours `spacing` points away
+# (wrapping around) must differ from the point, must not lie in exactly opposite directions, and the
+# average direction to them must point towards the centroid. Not fastmath, the result matches NumPy's.
+@njit(void(int32[:, ::1], int64, float64, float64, float64, boolean[::1]), cache=True, nogil=True)
+def angle_filter_mask(points, spacing, centroid_x, centroid_y, cos_threshold, out_mask):
+    n = points.shape[0]
+
+    for i in range(n):
+        x = points[i, 0]
+        y = points[i, 1]
+        prev_index = (i - spacing) % n
+        next_index = (i + spacing) % n
+        dx1 = points[prev_index, 0] - x
+        dy1 = points[prev_index, 1] - y
+        dx2 = points[next_index, 0] - x
+        dy2 = points[next_index, 1] - y
+
+        norm1 = math.sqrt(float(dx1) * dx1 + float(dy1) * dy1)
+        norm2 = math.sqrt(float(dx2) * dx2 + float(dy2) * dy2)
+        if norm1 <= 1e-8 or norm2 <= 1e-8:
+            out_mask[i] = False
+            continue
+
+        cos_angle = (dx1 * dx2 + dy1 * dy2) / (norm1 * norm2)
+        centroid_dot = (centroid_x - x) * ((dx1 + dx2) / 2) + (centroid_y - y) * ((dy1 + dy2) / 2)
+        out_mask[i] = cos_angle > -1.0 and centroid_dot >= cos_threshold
+
+
+# Sums of the block_size square blocks on the get_darkest_area grid, each block sampled every
+# sample_step pixels: out[i, j] is the block whose top left corner is (y0 + i * grid_step, x0 + j * grid_step).
+# Rows of blocks are summed in parallel, the caller takes the argmin so ties keep the first block.
+@njit(void(uint8[:, :], int64, int64, int64, int64, int64, int32[:, ::1]), parallel=True, cache=True)
+def sampled_block_sums(gray, y0, x0, grid_step, block_size, sample_step, out):
+    n_y, n_x = out.shape
+
+    for i in prange(n_y):
+        y = y0 + i * grid_step
+        for j in range(n_x):
+            x = x0 + j * grid_step
+            total = 0
+            for dy in range(0, block_size, sample_step):
+                for dx in range(0, block_size, sample_step):
+                    total += gray[y + dy, x + dx]
+            out[i, j] = total
@@ -1,9 +1,20 @@
+import functools
+import threading
 import time
 import sys
 import serial
 import serial.tools.list_ports
 import json
 
+def _serial_io(method):
+    """Run an ArduinoTracker method holding its serial lock, so each exchange (write, flush, reads and
+    buffer resets) completes before another thread, e.g. the EyeTracker command worker, touches the port"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._io_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class ArduinoTracker:
     """Handles connection and communication with Arduino hardware."""
     
@@ -41,6 +52,8 @@ class ArduinoTracker:
         self.is_test_running = False
         self.test_results = None
         self.prev_command = None
+        # Reentrant, start_test and get_test_results ping and stop the test while holding it
+        self._io_lock = threading.RLock()
         
         # If auto_connect is enabled, try to connect automatically
         if auto_connect:
@@ -126,6 +139,7 @@ class ArduinoTracker:
         
         return arduino_ports
 
+    @_serial_io
     def connect_to_port(self, port):
         """Connect to Arduino at specified port.
         
@@ -154,6 +168,7 @@ class ArduinoTracker:
             self.arduino = None
             return False
 
+    @_serial_io
     def ping(self):
         """Ping Arduino to verify connection.
         
@@ -194,6 +209,7 @@ class ArduinoTracker:
         """
         return self.arduino is not None and self.arduino.is_open
     
+    @_serial_io
     def disconnect(self):
         """Disconnect from Arduino."""
         try:
@@ -205,6 +221,7 @@ class ArduinoTracker:
             self.arduino = None
             self.is_test_running = False
 
+    @_serial_io
     def send_command(self, command):
         """Send command to Arduino and verify acknowledgment.
         
@@ -238,6 +255,7 @@ class ArduinoTracker:
             return 0
         
     
+    @_serial_io
     def check_ack(self):
         """Non-blocking check for Arduino acknowledgment."""
         if not self.is_connected():
@@ -255,6 +273,7 @@ class ArduinoTracker:
             print(f"Error checking acknowledgment: {e}")
             return 0
 
+    @_serial_io
     def start_test(self):
         """Start the test sequence on Arduino.
         
@@ -302,6 +321,7 @@ class ArduinoTracker:
             print(f"Error starting test: {e}")
             return False
 
+    @_serial_io
     def stop_test(self):
         """Stop the current test.
         
@@ -339,6 +359,7 @@ class ArduinoTracker:
             print(f"Error stopping test: {e}")
             return False
 
+    @_serial_io
     def get_test_results(self, timeout=5):
         """Get results from the completed test.
         
@@ -399,6 +420,7 @@ class ArduinoTracker:
         print(f"Timed out waiting for test results after {timeout} seconds")
         return None
 
+    @_serial_io
     def read_available_data(self):
         """Read and return any available data from Arduino.
         
@@ -433,6 +455,7 @@ class ArduinoTracker:
         else:
             return True
         
+    @_serial_io
     def get_test_status(self):
         """Check if test is still ongoing, and retrieve current test info."""
         if not self.is_connected():
@@ -1,25 +1,28 @@
 #!/usr/bin/env python3
 """
 Simple profiler for EyeTracker class
-Usage: python profiler_main.py
+Usage: python profiler_main.py [--save-prof PATH] [--threaded]
 """
 
+import argparse
 import sys
-import os
+import gc
 import time
 import cProfile
 import pstats
-import psutil
+import queue
+import threading
 import numpy as np
 
 # Add your app directory to path (adjust as needed)
 # sys.path.append('./app/core')  # Adjust this path to your app structure
 
 from app.core.pupil_tracker import EyeTracker 
+from app.core.profiler_utils import start_mem_sampler, warm_up_jit
 # from app.core.arduino_tracker import ArduinoTracker
 
-def profile_eye_tracker(num_frames=50):
-    """Profile EyeTracker performance"""
+def profile_eye_tracker(num_frames=50, save_path=None):
+    """Profile EyeTracker performance, cProfile data is written to save_path if given"""
     print(f"Starting EyeTracker profiling with {num_frames} frames...")
     
     # Initialize EyeTracker (without Arduino for testing)
@@ -31,6 +34,7 @@ def profile_eye_tracker(num_frames=50):
     
     # Warm up (first few frames are often slower)
     print("Warming up...")
+    warm_up_jit()
     for _ in range(5):
         eye_tracker.get_processed_frame()
     
@@ -38,64 +42,152 @@ def profile_eye_tracker(num_frames=50):
     print("Starting profiling...")
     profiler = cProfile.Profile()
     
-    frame_times = []
+    # Per-frame durations in integer nanoseconds, converted to ms only when printed.
+    # The hot loop only records timestamps, memory is sampled on a side thread
+    frame_times = np.empty(num_frames, dtype=np.int64)
+    frame_count = 0
     memory_usage = []
+    sampler_thread, stop_sampler = start_mem_sampler(memory_usage, 0.1)
     
+    # Collect up front and keep the GC off while timing so a collection
+    # cannot land mid-loop and skew max/std dev frame times
+    gc.collect()
+    gc.disable()
     profiler.enable()
     
-    for i in range(num_frames):
-        # Track memory every 10 frames
-        if i % 10 == 0:
-            process = psutil.Process(os.getpid())
-            memory_usage.append(process.memory_info().rss / 1024 / 1024)  # MB
-            print(f"Frame {i}/{num_frames} - Memory: {memory_usage[-1]:.1f}MB")
-        
-        # Time individual frame processing
-        start_time = time.time()
-        processed_frame = eye_tracker.get_processed_frame()
-        frame_time = time.time() - start_time
-        
-        if processed_frame is not None:
-            frame_times.append(frame_time)
-        else:
-            print(f"Warning: Frame {i} returned None")
-            break
-    
-    profiler.disable()
+    try:
+        for i in range(num_frames):
+            # Time individual frame processing
+            start_time = time.perf_counter_ns()
+            processed_frame = eye_tracker.get_processed_frame(draw=False)
+            frame_time = time.perf_counter_ns() - start_time
+            
+            if processed_frame is not None:
+                frame_times[i] = frame_time
+                frame_count += 1
+            else:
+                print(f"Warning: Frame {i} returned None")
+                break
+    finally:
+        profiler.disable()
+        gc.enable()
+        gc.collect()
+        stop_sampler.set()
+        sampler_thread.join()
     
-    # Save profiling data
-    profiler.dump_stats('eye_tracker_profile.prof')
+    # Save profiling data only when persistence is requested
+    if save_path:
+        profiler.dump_stats(save_path)
     
     # Print results
-    print_results(frame_times, memory_usage, len(frame_times))
+    print_results(frame_times[:frame_count], memory_usage, frame_count)
+    
+    # Print leaf hot spots (time excluding subcalls) and then cumulative view
+    stats = pstats.Stats(profiler)
+    print("\n" + "="*60)
+    print("TOP FUNCTIONS BY OWN TIME (tottime):")
+    print("="*60)
+    stats.sort_stats('tottime').print_stats(10)
     
-    # Print top time-consuming functions
     print("\n" + "="*60)
-    print("TOP TIME-CONSUMING FUNCTIONS:")
+    print("TOP FUNCTIONS BY CUMULATIVE TIME:")
     print("="*60)
-    stats = pstats.Stats('eye_tracker_profile.prof')
-    stats.sort_stats('cumulative')
-    stats.print_stats(15)  # Show top 15 functions
+    stats.sort_stats('cumulative').print_stats(10)
     
     eye_tracker.release()
     return stats
 
+def profile_eye_tracker_threaded(num_frames=50):
+    """Profile EyeTracker with camera reads and display overlapped with processing
+
+    Three stages linked by bounded queues: a reader thread grabbing raw frames,
+    the main thread running pupil detection, and a writer thread consuming the
+    annotated frames. maxsize=2 gives back-pressure so the reader cannot
+    outpace processing. Processing stays on one thread so OpenCV state is
+    never shared.
+    """
+    print(f"Starting threaded EyeTracker profiling with {num_frames} frames...")
+
+    eye_tracker = EyeTracker(arduino_tracker=None, threaded_capture=False)  # The reader stage below reads the camera
+
+    if not eye_tracker.cap or not eye_tracker.cap.isOpened():
+        print("ERROR: Could not initialize camera")
+        return
+
+    # Same JIT warm up as the serial run so the two are comparable
+    warm_up_jit()
+
+    read_q = queue.Queue(maxsize=2)
+    write_q = queue.Queue(maxsize=2)
+    written = [0]
+
+    def reader():
+        for _ in range(num_frames):
+            ret, raw = eye_tracker.cap.read()
+            if not ret:
+                break
+            read_q.put(raw)
+        read_q.put(None)  # Sentinel, no more frames
+
+    def writer():
+        while True:
+            processed_frame = write_q.get()
+            if processed_frame is None:
+                break
+            # Display/encode would go here, just count for profiling
+            written[0] += 1
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    writer_thread = threading.Thread(target=writer, daemon=True)
+
+    frame_times = np.empty(num_frames, dtype=np.int64)
+    frame_count = 0
+
+    total_start = time.perf_counter_ns()
+    reader_thread.start()
+    writer_thread.start()
+
+    while True:
+        raw = read_q.get()
+        if raw is None:
+            break
+
+        start_time = time.perf_counter_ns()
+        processed_frame = eye_tracker._process_single_frame(raw)
+        frame_times[frame_count] = time.perf_counter_ns() - start_time
+        frame_count += 1
+
+        if processed_frame is not None:
+            write_q.put(processed_frame)
+
+    write_q.put(None)
+    reader_thread.join()
+    writer_thread.join()
+    total_time = (time.perf_counter_ns() - total_start) * 1e-9
+
+    print_results(frame_times[:frame_count], [], frame_count)
+    if total_time > 0:
+        print(f"Pipeline throughput: {written[0] / total_time:.2f} FPS ({written[0]} frames written)")
+
+    eye_tracker.release()
+
 def print_results(frame_times, memory_usage, frame_count):
-    """Print profiling results"""
+    """Print profiling results, frame_times are in nanoseconds"""
     print("\n" + "="*50)
     print("PROFILING RESULTS")
     print("="*50)
     
-    if frame_times:
-        avg_time = np.mean(frame_times)
+    frame_times = np.asarray(frame_times)
+    if frame_times.size:
+        avg_time = frame_times.mean() * 1e-9
         fps = 1.0 / avg_time if avg_time > 0 else 0
         
         print(f"Frames processed: {frame_count}")
         print(f"Average FPS: {fps:.2f}")
         print(f"Average frame time: {avg_time*1000:.2f}ms")
-        print(f"Min frame time: {min(frame_times)*1000:.2f}ms")
-        print(f"Max frame time: {max(frame_times)*1000:.2f}ms")
-        print(f"Frame time std dev: {np.std(frame_times)*1000:.2f}ms")
+        print(f"Min frame time: {frame_times.min()*1e-6:.2f}ms")
+        print(f"Max frame time: {frame_times.max()*1e-6:.2f}ms")
+        print(f"Frame time std dev: {frame_times.std()*1e-6:.2f}ms")
         
         # Performance categories
         if fps >= 50:
@@ -128,21 +220,28 @@ def quick_benchmark():
     # Test 10 frames
     times = []
     for i in range(10):
-        start = time.time()
+        start = time.perf_counter_ns()
         frame = eye_tracker.get_processed_frame()
-        end = time.time()
+        elapsed = time.perf_counter_ns() - start
         
         if frame is not None:
-            times.append(end - start)
-            print(f"Frame {i+1}: {(end-start)*1000:.1f}ms")
+            times.append(elapsed)
+            print(f"Frame {i+1}: {elapsed*1e-6:.1f}ms")
     
     if times:
-        avg_fps = 1.0 / np.mean(times)
+        avg_fps = 1e9 / np.mean(times)
         print(f"\nQuick test average: {avg_fps:.1f} FPS")
     
     eye_tracker.release()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the EyeTracker pipeline")
+    parser.add_argument("--save-prof", metavar="PATH", default=None,
+                        help="write the cProfile data to PATH for later inspection")
+    parser.add_argument("--threaded", action="store_true",
+                        help="also run the pipelined profiler (reader, processing and writer stages) to compare with the serial run")
+    args = parser.parse_args()
+    
     print("EyeTracker Profiler")
     print("==================")
     
@@ -161,14 +260,21 @@ if __name__ == "__main__":
         print("\n" + "-"*50)
         
         # Run full profiling
-        profile_eye_tracker(num_frames=200)
+        profile_eye_tracker(num_frames=200, save_path=args.save_prof)
+        
+        if args.threaded:
+            print("\n" + "-"*50)
+            
+            # Same frame count as the serial run
+            profile_eye_tracker_threaded(num_frames=200)
         
         print("\n" + "="*50)
         print("PROFILING COMPLETE")
         print("="*50)
-        print("Profile data saved to: eye_tracker_profile.prof")
-        print("\nTo view detailed profile:")
-        print("python -c \"import pstats; pstats.Stats('eye_tracker_profile.prof').sort_stats('cumulative').print_stats(20)\"")
+        if args.save_prof:
+            print(f"Profile data saved to: {args.save_prof}")
+            print("\nTo view detailed profile:")
+            print(f"python -c \"import pstats; pstats.Stats('{args.save_prof}').sort_stats('cumulative').print_stats(20)\"")
         
     except KeyboardInterrupt:
         print("\nProfiling interrupted by user")
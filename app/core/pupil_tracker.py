@@ -1,11 +1,17 @@
 import cv2
+import logging
 import numpy as np
-import math
-import gc
+import queue
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from app.core.pupil_tracker_utils import EyeTrackerUtils
+from app.core._pupil_kernels import fused_threshold3
+
+# Child of the application logger so messages reach its handlers, per frame messages are debug level
+logger = logging.getLogger('eyetracker.pupil_tracker')
 
 # FOR PROFILLING uncomment this code and comment out code above, 
 # relative import path changed as profiling script is in the same dir
@@ -22,16 +28,76 @@ class EyeTracker():
     CAMERA_FEED = 0
     TEST_VIDEO = 1
     KERNEL_SIZE = 5
+    MASK_SQUARE_SIZE = 250 # Side length of the square around the pupil kept after thresholding
+    WORKING_BUFFER_KEYS = ('gray', 'thresholded_strict', 'thresholded_medium', 'thresholded_relaxed',
+                           'dilated_relaxed', 'dilated_medium', 'dilated_strict')
+
+    # Temporal coherence for the darkest point search: once the point has been steady for a few full searches,
+    # search a window around it first and keep it if it has not moved and its darkness is unchanged.
+    # A full search is forced periodically, and any failed window search drops back to full searches
+    DARKEST_SEARCH_RADIUS = 32
+    DARKEST_MAX_SHIFT = 3
+    DARKEST_STABLE_FRAMES = 5
+    DARKEST_MAX_VALUE_CHANGE = 2
+    DARKEST_FULL_SEARCH_INTERVAL = 30
+
+    # Adaptive frame skipping: while locked and comfortably within threshold for SKIP_STABLE_FRAMES frames, up to
+    # SKIP_MAX_CONSECUTIVE frames in a row reuse the last result if the pupil square barely changed. The change is
+    # the mean absolute difference of a 1/SKIP_DIFF_SCALE downsampled pupil square against the last processed frame
+    SKIP_STABLE_FRAMES = 10
+    SKIP_MAX_CONSECUTIVE = 2
+    SKIP_DIFF_SCALE = 4
+    SKIP_DIFF_THRESHOLD = 3.0
+
+    # Early exit in process_frames: accept last frame's threshold without scoring the others when it reaches
+    # this share of the recent best score. The recent best decays so it follows slow changes (~30 frames)
+    EARLY_ACCEPT_RATIO = 0.9
+    RECENT_BEST_DECAY = 0.97
+
+    # Low power mode scores the thresholds on a half resolution copy of the pupil square and only maps the
+    # winning contour back to full resolution for the final ellipse fit
+    LOW_POWER_SCORING_SCALE = 2
+    MIN_CONTOUR_AREA = 1000 # At full resolution
 
     LOW_POWER = 0
     MEDIUM_POWER = 1
     HIGH_POWER = 2
     
-    def __init__(self, arduino_tracker=None):
-        """Initialize the eye tracker"""
+    # Requested capture size, only the square around the pupil is processed so more pixels are just bandwidth
+    CAPTURE_WIDTH = 640
+    CAPTURE_HEIGHT = 480
+    CAPTURE_QUEUE_SIZE = 2
+    CAPTURE_TIMEOUT = 1.0 # Seconds get_processed_frame waits for the reader thread
+    # Compressed capture, uncompressed YUYV saturates USB 2 and caps the frame rate. Must be set before the size
+    CAPTURE_FOURCC = cv2.VideoWriter_fourcc(*'MJPG')
+
+    # OpenCV's internal thread pool per call. The thresholds are already scored on our own threads and the
+    # per call ops run on a ~260px square, where spinning up OpenCV's workers (findContours especially)
+    # costs more than it saves
+    OPENCV_THREADS = 1
+    
+    def __init__(self, arduino_tracker=None, threaded_capture=True):
+        """Initialize the eye tracker
+
+        With threaded_capture a background thread reads the camera so decoding the next frame overlaps
+        processing the current one. Pass False when the caller reads self.cap itself.
+        """
+        cv2.setNumThreads(self.OPENCV_THREADS)
+        cv2.setUseOptimized(True)
+
         self.tracker = arduino_tracker
         self.cap = None
 
+        # Capture thread state, the reader is started once the camera is open
+        self.threaded_capture = threaded_capture
+        self._frame_queue = queue.Queue(maxsize=self.CAPTURE_QUEUE_SIZE)
+        self._stop_event = threading.Event()
+        self._reader_thread = None
+        # Guards the hand over of the capture between release() and a reader thread that outlived its join
+        self._capture_lock = threading.Lock()
+        self._reader_exited = False
+        self._release_capture_on_exit = False
+
         # Video input path 
         self.vid_input = self.CAMERA_FEED
         
@@ -39,80 +105,170 @@ class EyeTracker():
         # self.threshold_value = 15  # Default threshold value (no clue)
         self.zoom_factor = 1 # Video feed zoom factor
         self.lockpos_threshold = 48 # Allowable distance between pupil position and initial calibrated position. (Euclid dist)
+        self._lockpos_threshold_sq = self.lockpos_threshold ** 2 # Compared against the squared distance to avoid the sqrt
         self.zoom_center = None 
         self.confidence_margin_for_switching_bin_threshold = 2
         self.power_optimisation = self.HIGH_POWER
+        self._get_darkest = None # Per power mode strategies, bound by set_power
+        self._scoring_scale = 1
+        self._optimize_contours = None
         
         # State tracking
         self.pupil_center_pos = None # Tracks the center of the pupil (center of darkest area)
         self.is_position_locked = False # False if not calibrated, i.e. Locked when user's pupil is at the correct position
         self.locked_position = -1 # Tracks the locked position coordinates, the calibrated position.
-        self.distance_between_pupilpos_and_lockpos = 0 # Tracks the distance between the pupil pos in the current frame with the initial calibrated position
+        self.sq_distance_between_pupilpos_and_lockpos = 0 # Tracks the squared distance between the pupil pos in the current frame with the initial calibrated position
         self.is_pupil_pos_within_threshold = True # True if the distance between the pupil pos current frame within the set threshold. i.e. False if too far, user is looking away
         self.prev_command = 'L'
+
+        # Arduino commands are sent from a worker thread so the serial write never blocks the frame path.
+        # The queue holds at most one unsent command, a newer one replaces it
+        self._command_queue = queue.Queue(maxsize=1)
+        self._queued_command = self.prev_command # Last command handed to the worker, resent only if it failed
+        self._command_lock = threading.Lock() # Guards _queued_command and prev_command, shared with the worker
+        self._arduino_stop = threading.Event()
+        self._arduino_thread = None
+        if self.tracker is not None:
+            self._arduino_thread = threading.Thread(target=self._arduino_loop, name="EyeTrackerArduino", daemon=True)
+            self._arduino_thread.start()
         self.frame_count = 0
 
+        # Per threshold result lists reused by process_frames (relaxed, medium, strict)
+        self._goodness = np.zeros(3, dtype=np.float64)
+        self._final_contours = [[] for _ in range(3)]
+        self._ellipse_reduced_contours = [[] for _ in range(3)]
+        self._threshold_results = [None] * 3
+        self._recent_best_goodness = 0
+        self.set_power(self.power_optimisation)
+
+        self.verbose = False # Log threshold switches, off by default as they can happen every frame
+
+        self.use_opencl = False # Dilate through OpenCV's transparent API (UMat) on an OpenCL device, see set_opencl
+        self._cuda_dilate = None # CUDA morphology filters by kernel shape, created once by set_cuda and reused every frame
+        self._cuda_box_filter = None # CUDA box filter for the low power darkest point search, see set_cuda
+        self._cuda_lock = threading.Lock() # The CUDA filter keeps internal buffers, thresholds are dilated concurrently
+        self._darkest_cache = None # (pupil_center_pos, darkest_pixel_value, frames since last full search)
+        self._stable_frame_count = 0 # Consecutive full searches that found the darkest point where it was
+
+        # Adaptive frame skipping state
+        self._stability_run = 0 # Consecutive processed frames locked and well within threshold
+        self._skip_counter = 0 # Frames skipped since the last processed frame
+        self._skip_reference = None # Downsampled pupil square of the last processed frame
+        self._last_rotated_rect = None # Pupil ellipse of the last processed frame, its center is redrawn on skipped frames
+        self._last_lock_ellipse = None # (ellipse, color) lockpos drew on the last processed frame, redrawn on skipped frames
+
         self.prev_threshold_index = 0 # Tracks the grayscale threshold used. There are 3 grayscale thresholds used, for differing degree of strictness. 1 - light, 2 - medium, 3 - heavy (strict). The threshold used is dynamically determined to give best fitted pupil.
 
         # Pre-allocate working arrays, to reduce memory usage
         self.working_arrays = {
-            'kernel': np.ones((self.KERNEL_SIZE, self.KERNEL_SIZE), np.uint8),
+            # Two dilations with a 5x5 rect equal one dilation with a 9x9 rect, so a single pass is used
+            'kernel9': cv2.getStructuringElement(cv2.MORPH_RECT, (2 * self.KERNEL_SIZE - 1, 2 * self.KERNEL_SIZE - 1)),
+            'kernel5': cv2.getStructuringElement(cv2.MORPH_RECT, (self.KERNEL_SIZE, self.KERNEL_SIZE)), # Same reach at half resolution
+            # Per frame image buffers, sized on the first frame and reused (see _get_working_buffers)
+            'gray': None,
+            'thresholded_strict': None,
+            'thresholded_medium': None,
+            'thresholded_relaxed': None,
+            'dilated_relaxed': None, # One dilation buffer per threshold since they are scored concurrently
+            'dilated_medium': None,
+            'dilated_strict': None,
         }
+
+        # Direct references for the per frame path, avoiding the dict lookups
+        self._kernel = self.working_arrays['kernel9']
+        self._kernel_half = self.working_arrays['kernel5']
+        self._dilated = None # [relaxed, medium, strict] dilation buffers, set by _get_working_buffers
         
+        # Persistent pool for scoring the medium and strict thresholds in parallel (OpenCV releases the GIL).
+        # Relaxed is scored first since its bounding box limits the other two, after that the calling thread
+        # scores one of them itself, so a single worker gives full overlap
+        self._pool = ThreadPoolExecutor(max_workers=1)
+
         # Initialize camera
         self.camera_ready = self._initialize_camera()
 
     def process_frames(self, prev_threshold_index, threshold_swtich_confidence_margin, 
                     thresholded_image_strict, thresholded_image_medium, thresholded_image_relaxed, 
-                    frame, gray_frame
+                    frame, gray_frame, draw=True, roi_offset=(0, 0), roi_scale=1
                     ):
         """
         Process frames but don't show OpenCV windows
+
+        When draw is False no overlay is rasterised and the input frame is returned untouched.
+        The thresholded images may be a crop of the frame starting at roi_offset (x, y), downscaled
+        by roi_scale, returned contours are always in frame coordinates
         """
-        kernel = self.working_arrays.get('kernel')
-        if kernel is None:
-            raise ValueError("Kernel not found in working_arrays.")
+        kernel = self._kernel if roi_scale == 1 else self._kernel_half
+        min_area = self.MIN_CONTOUR_AREA // (roi_scale * roi_scale)
         
-        image_array = [thresholded_image_relaxed, thresholded_image_medium, thresholded_image_strict] #holds images
-        goodness = [0] * 3 # goodness arr for to store goodness for all ellipse
-        final_contours = [[] for _ in range (3)] #holds final contours
-        ellipse_reduced_contours = [[] for _ in range (3)] #holds an array of the best contour points from the fitting process
+        roi_h, roi_w = thresholded_image_relaxed.shape
+        dilated_array = [buffer[:roi_h, :roi_w] for buffer in self._dilated]
+        offset = np.array(roi_offset, np.int32)
+
+        # Per threshold results, preallocated in __init__ and reset in place every frame
+        goodness = self._goodness # goodness arr for to store goodness for all ellipse
+        final_contours = self._final_contours #holds final contours
+        ellipse_reduced_contours = self._ellipse_reduced_contours #holds an array of the best contour points from the fitting process
+        results = self._threshold_results
+        goodness[:] = 0
+        for i in range(3):
+            final_contours[i] = []
+            ellipse_reduced_contours[i] = []
+            results[i] = None
         
         final_rotated_rect = ((0,0),(0,0),0)
         final_goodness = 0
         best_image_threshold_index = 1
         
-        #iterate through binary images and see which fits the ellipse best
-        for i, img in enumerate(image_array):
-            # Dilate the binary image
-            dilated_image = cv2.dilate(img, kernel, iterations=2)
-            
-            # Find contours
-            contours, hierachy = cv2.findContours(dilated_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            # Create an empty image to draw contours
-            # contour_img2 = np.zeros_like(dilated_image)
-            reduced_contours = EyeTrackerUtils.filter_contours_by_area_and_return_largest(contours, 1000, 3)
-
-            if reduced_contours and len(reduced_contours[0]) > 5:
-                # Cache the main contour for reuse
-                main_contour = reduced_contours[0]
-
-                # Calculate goodness and pixel metrics
-                current_goodness = EyeTrackerUtils.check_ellipse_goodness(dilated_image, main_contour)
-                total_pixels = EyeTrackerUtils.check_contour_pixels(main_contour, dilated_image.shape) #  in total pixels, first element is pixel total, next is ratio 
-                
-                # Combined goodness score
-                current_score = current_goodness[0]*total_pixels[0]*total_pixels[0]*total_pixels[1]
-            
+        thresholded_images = (thresholded_image_relaxed, thresholded_image_medium, thresholded_image_strict)
+
+        # Score the threshold used last frame first, it is the most likely winner. If it scores close to the
+        # recent best the other two are skipped, they would not be switched to anyway without a large margin
+        first_index = prev_threshold_index if 0 <= prev_threshold_index < 3 else 0
+        results[first_index] = self._score_one_threshold(thresholded_images[first_index], kernel, dilated_array[first_index],
+                                                          offset=offset, scale=roi_scale, min_area=min_area)
+        first_score = results[first_index][0] if results[first_index][1] is not None else 0
+        accepted_early = self._recent_best_goodness > 0 and first_score > self.EARLY_ACCEPT_RATIO * self._recent_best_goodness
+
+        if not accepted_early:
+            # The thresholds are nested (strict ⊂ medium ⊂ relaxed), so everything the medium and strict
+            # images can produce after dilation lies inside the bounding box of the dilated relaxed image
+            if results[0] is None:
+                results[0] = self._score_one_threshold(thresholded_image_relaxed, kernel, dilated_array[0],
+                                                       offset=offset, scale=roi_scale, min_area=min_area)
+            relaxed_roi = results[0][3]
+
+            # If the relaxed image was empty the stricter ones are too, otherwise score the rest in parallel,
+            # one of them on this thread instead of idling while waiting for the pool
+            remaining = [i for i in (1, 2) if results[i] is None]
+            if remaining and relaxed_roi[2] > 0 and relaxed_roi[3] > 0:
+                pending = [(i, self._pool.submit(self._score_one_threshold, thresholded_images[i], kernel, dilated_array[i],
+                                                 relaxed_roi, offset, roi_scale, min_area))
+                           for i in remaining[1:]]
+                i = remaining[0]
+                results[i] = self._score_one_threshold(thresholded_images[i], kernel, dilated_array[i], relaxed_roi, offset, roi_scale, min_area)
+                for i, future in pending:
+                    results[i] = future.result()
+
+        #iterate through the scored binary images and see which fits the ellipse best
+        for i in range(3):
+            result = results[i]
+            if result is None:
+                continue
+
+            current_score, reduced_contours, reduced_points, _ = result
+            if reduced_contours is not None:
                 goodness[i] = current_score
-                ellipse_reduced_contours[i] = total_pixels[2]
+                ellipse_reduced_contours[i] = reduced_points
                 final_contours[i] = reduced_contours
 
                 # If the current iteration has the best goodness set it as best_image_threshold_index
                 if current_score > final_goodness:
                     best_image_threshold_index = i
                     final_goodness = current_score
+
+        # Decaying max of the best score, the reference for accepting the first threshold early
+        self._recent_best_goodness = max(final_goodness, self._recent_best_goodness * self.RECENT_BEST_DECAY)
             
         # Confidence-Based Threshold Switching, to prevent flickering caused by toggling between thresholds, only switch if goodness difference btw thres is significant
         # If the threshold index used in the previous frame and cur frame are not the same, apply confidence check
@@ -122,7 +278,9 @@ class EyeTracker():
         
             # If the best_image index's goodness is better than prev_goodness by the stipluted margin, switch images, else dont 
             if goodness[best_image_threshold_index] > prev_goodness * (1 + threshold_swtich_confidence_margin):
-                print("Changed prev_threshold_index ", prev_threshold_index, " prev_goodness ", prev_goodness, " cur index ", best_image_threshold_index, " goodness ", goodness[best_image_threshold_index])
+                if self.verbose:
+                    logger.debug("Changed prev_threshold_index %d prev_goodness %s cur index %d goodness %s",
+                                 prev_threshold_index, prev_goodness, best_image_threshold_index, goodness[best_image_threshold_index])
                 prev_threshold_index = best_image_threshold_index
 
         # Use the selected threshold results
@@ -132,39 +290,99 @@ class EyeTracker():
         if self.is_position_locked:
             # print("lock_mode_on running,  track_darkest_pt ", self.locked_position,  " darkest_point ", self.pupil_center_pos)
             if self.locked_position == -1:
-                print("Calibration Error:, pupil position not calibrated!")
+                logger.warning("Calibration Error:, pupil position not calibrated!")
             else:
-                # Calc euclid dist between curr darkest point and calibrated position
-                self.distance_between_pupilpos_and_lockpos =  math.dist(self.locked_position, self.pupil_center_pos) 
-                frame = self.lockpos(frame, selected_contours)
+                # Calc squared euclid dist between curr darkest point and calibrated position
+                dx = self.locked_position[0] - self.pupil_center_pos[0]
+                dy = self.locked_position[1] - self.pupil_center_pos[1]
+                self.sq_distance_between_pupilpos_and_lockpos = dx * dx + dy * dy
+                frame = self.lockpos(frame, selected_contours, draw=draw)
 
-        test_frame = frame.copy()
-        
         if selected_contours:
-            if self.power_optimisation == self.HIGH_POWER:
-                optimised_contours = [EyeTrackerUtils.optimize_contours_by_angle(selected_contours, gray_frame)]
-            else:
-                optimised_contours = [EyeTrackerUtils.optimize_contours_by_angle_vectorised(selected_contours, gray_frame)]
+            optimised_contours = [self._optimize_contours(selected_contours, gray_frame)]
             
             if optimised_contours and not isinstance(optimised_contours[0], list) and len(optimised_contours[0]) > 5:
-                ellipse = cv2.fitEllipse(optimised_contours[0])
+                ellipse = cv2.fitEllipseDirect(optimised_contours[0])
                 final_rotated_rect = ellipse
-                center_x, center_y = map(int, ellipse[0])
-                cv2.circle(test_frame, (center_x, center_y), 3, (255, 255, 0), -1)
 
-                if self.is_position_locked == False:
-                    cv2.ellipse(test_frame, ellipse, (255, 0, 0), 2)
+                if draw:
+                    center_x, center_y = map(int, ellipse[0])
+                    cv2.circle(frame, (center_x, center_y), 3, (255, 255, 0), -1)
+
+                    if self.is_position_locked == False:
+                        cv2.ellipse(frame, ellipse, (255, 0, 0), 2)
 
         else:
             optimised_contours = []
 
-        del dilated_image, contours, hierachy, reduced_contours, final_contours 
+        # Return the frame, drawn on directly (a fresh capture owned by this call) with all the visualizations
+        return frame, final_rotated_rect, optimised_contours, prev_threshold_index
+
+    def _dilate(self, src, kernel, dst):
+        """Dilate src into dst, on the CUDA or OpenCL device when enabled (findContours needs the result back on the CPU)"""
+        if self._cuda_dilate is not None:
+            with self._cuda_lock:
+                gpu_src = cv2.cuda_GpuMat()
+                gpu_src.upload(np.ascontiguousarray(src))
+                dst[...] = self._cuda_dilate[kernel.shape].apply(gpu_src).download()
+        elif self.use_opencl:
+            dst[...] = cv2.dilate(cv2.UMat(np.ascontiguousarray(src)), kernel, iterations=1).get()
+        else:
+            cv2.dilate(src, kernel, dst=dst, iterations=1)
+
+    def _score_one_threshold(self, img, kernel, dilated_image, roi=None, offset=None, scale=1, min_area=MIN_CONTOUR_AREA):
+        """
+        Dilate one thresholded image into dilated_image, find its best contour and score the fitted ellipse
+
+        If roi (x, y, w, h) is given, dilation and contour tracing are limited to it.
+        Contours are scored in image coordinates and returned scaled by scale and shifted by offset (x, y) if given.
+        Returns (score, reduced_contours, reduced_points, dilated_roi), reduced_contours is None
+        when no usable contour was found and dilated_roi is the bounding box of the dilated image.
+        """
+        if roi is None:
+            # Dilate the binary image
+            self._dilate(img, kernel, dilated_image)
+
+            # Find contours, tracing only the bounding box of the white pixels so the scan skips the empty border
+            dilated_roi = cv2.boundingRect(dilated_image)
+            x, y, w, h = dilated_roi
+            if w == 0 or h == 0:
+                return 0, None, None, dilated_roi
+            contours, hierachy = cv2.findContours(dilated_image[y:y+h, x:x+w], cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_TC89_KCOS, offset=(x, y))
+        else:
+            # Dilate and trace only inside the roi, keeping a full size image for scoring
+            x, y, w, h = roi
+            dilated_image.fill(0)
+            self._dilate(img[y:y+h, x:x+w], kernel, dilated_image[y:y+h, x:x+w])
+            contours, hierachy = cv2.findContours(dilated_image[y:y+h, x:x+w], cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_TC89_KCOS, offset=(x, y))
+            dilated_roi = roi
+
+        # findContours is kept over connectedComponentsWithStats + per blob tracing: on the ~260px pupil crop
+        # labelling alone costs as much as tracing with noise and ~10x more on a clean pupil
+        reduced_contours = EyeTrackerUtils.filter_contours_by_area_and_return_largest(contours, min_area, 3)
+
+        if not reduced_contours or len(reduced_contours[0]) <= 5:
+            return 0, None, None, dilated_roi
 
-        # Return the test_frame which has all the visualizations
-        return test_frame, final_rotated_rect, optimised_contours, prev_threshold_index
+        # Cache the main contour for reuse
+        main_contour = reduced_contours[0]
+
+        # Calculate goodness and pixel metrics
+        current_goodness, total_pixels = EyeTrackerUtils.evaluate_contour(dilated_image, main_contour) #  in total pixels, first element is pixel total, next is ratio 
+
+        # Combined goodness score
+        current_score = current_goodness[0]*total_pixels[0]*total_pixels[0]*total_pixels[1]
+
+        # Scale and shift back to frame coordinates when working on a (downscaled) crop
+        if scale != 1:
+            reduced_contours = [contour * scale for contour in reduced_contours]
+        if offset is not None and offset.any():
+            reduced_contours = [contour + offset for contour in reduced_contours]
+
+        return current_score, reduced_contours, total_pixels[2], dilated_roi
 
     # Finds the pupil in an individual frame and returns the center point
-    def _process_single_frame(self, frame):
+    def _process_single_frame(self, frame, draw=True):
         """Process a single frame with all your existing algorithms"""
         if frame is None:
             return None
@@ -176,28 +394,58 @@ class EyeTracker():
         if self.zoom_factor > 1:
             frame = EyeTrackerUtils.zoom_frame(frame, self.zoom_factor, self.zoom_center)
         
+        buffers = self._get_working_buffers(frame.shape[:2])
+
+        # Convert to grayscale
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffers['gray'])
+
+        # Reuse the last result when the pupil is steady and nothing changed around it
+        if self._can_skip_detection(gray_frame):
+            self._skip_counter += 1
+            if draw:
+                # Same overlay as the processed frames: the lockpos ellipse and the fitted pupil center
+                if self._last_lock_ellipse is not None:
+                    cv2.ellipse(frame, self._last_lock_ellipse[0], self._last_lock_ellipse[1], 2)
+                if self._last_rotated_rect is not None:
+                    cv2.circle(frame, tuple(map(int, self._last_rotated_rect[0])), 3, (255, 255, 0), -1)
+            return frame
+
         # Find the darkest point (pupil center)
-        if self.power_optimisation == self.LOW_POWER:
-            self.pupil_center_pos = EyeTrackerUtils.get_darkest_area_optimised(frame)
-        else:
-            self.pupil_center_pos = EyeTrackerUtils.get_darkest_area_vectorized(frame)
+        self.pupil_center_pos = self._get_darkest(frame, gray_frame)
             
         if self.pupil_center_pos is None:
             return frame  # Return original frame if no darkest point found
         
-        # Convert to grayscale
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         darkest_pixel_value = gray_frame[self.pupil_center_pos[1], self.pupil_center_pos[0]]
         
-        # Apply thresholding at different levels (from your original code)
-        thresholded_image_strict = EyeTrackerUtils.apply_binary_threshold(gray_frame, darkest_pixel_value, 5)
-        thresholded_image_strict = EyeTrackerUtils.mask_outside_square(thresholded_image_strict, self.pupil_center_pos, 250)
-        
-        thresholded_image_medium = EyeTrackerUtils.apply_binary_threshold(gray_frame, darkest_pixel_value, 15)
-        thresholded_image_medium = EyeTrackerUtils.mask_outside_square(thresholded_image_medium, self.pupil_center_pos, 250)
-        
-        thresholded_image_relaxed = EyeTrackerUtils.apply_binary_threshold(gray_frame, darkest_pixel_value, 25)
-        thresholded_image_relaxed = EyeTrackerUtils.mask_outside_square(thresholded_image_relaxed, self.pupil_center_pos, 250)
+        # Everything outside the square around the pupil is masked, so only work on that square plus
+        # the reach of the dilation kernel, all later steps operate on this crop
+        center_x, center_y = self.pupil_center_pos
+        reach = self.MASK_SQUARE_SIZE // 2 + self.KERNEL_SIZE - 1
+        frame_h, frame_w = gray_frame.shape
+        x0, y0 = max(0, center_x - reach), max(0, center_y - reach)
+        x1, y1 = min(frame_w, center_x + reach), min(frame_h, center_y + reach)
+
+        gray_roi = gray_frame[y0:y1, x0:x1]
+        roi_center_x, roi_center_y = center_x - x0, center_y - y0
+        half_size = self.MASK_SQUARE_SIZE // 2
+
+        # Low power: score at half resolution, thresholds relative to the darkest value of the blurred copy
+        scale = self._scoring_scale
+        if scale != 1:
+            gray_roi = cv2.pyrDown(gray_roi)
+            roi_center_x, roi_center_y, half_size = roi_center_x // scale, roi_center_y // scale, half_size // scale
+            darkest_pixel_value = gray_roi[roi_center_y, roi_center_x]
+
+        # Apply thresholding at different levels and mask outside the pupil square,
+        # all three levels in one fused pass writing into the reused buffers
+        roi_h, roi_w = gray_roi.shape
+        thresholded_image_strict = buffers['thresholded_strict'][:roi_h, :roi_w]
+        thresholded_image_medium = buffers['thresholded_medium'][:roi_h, :roi_w]
+        thresholded_image_relaxed = buffers['thresholded_relaxed'][:roi_h, :roi_w]
+        fused_threshold3(gray_roi, roi_center_x, roi_center_y, int(darkest_pixel_value),
+                         half_size, 5, 15, 25,
+                         thresholded_image_strict, thresholded_image_medium, thresholded_image_relaxed)
         
         # Check if we have a locked position to track
         self.locked_position = self.locked_position if self.is_position_locked else -1
@@ -211,35 +459,246 @@ class EyeTracker():
             thresholded_image_relaxed,
             frame, 
             gray_frame,
+            draw=draw,
+            roi_offset=(x0, y0),
+            roi_scale=scale,
         )
         
         # Update threshold index for next frame
         self.prev_threshold_index = threshold_index
-        
-        del gray_frame, thresholded_image_strict, thresholded_image_medium, thresholded_image_relaxed
+
+        self._update_skip_state(gray_frame, pupil_rotated_rect, final_contours)
         
         # Return the processed frame with visualizations
         return processed_frame
 
-    def get_processed_frame(self):
-        """Get current frame with processing applied - called by GUI timer"""
+    def _pupil_square_small(self, gray_frame):
+        """Downsampled pupil square around the current pupil position, used to detect change between frames"""
+        half = self.MASK_SQUARE_SIZE // 2
+        center_x, center_y = self.pupil_center_pos
+        roi = gray_frame[max(0, center_y - half):center_y + half, max(0, center_x - half):center_x + half]
+        if roi.size == 0:
+            return None
+        size = (max(1, roi.shape[1] // self.SKIP_DIFF_SCALE), max(1, roi.shape[0] // self.SKIP_DIFF_SCALE))
+        return cv2.resize(roi, size, interpolation=cv2.INTER_AREA)
+
+    def _can_skip_detection(self, gray_frame):
+        """True if this frame can reuse the last result, see SKIP_STABLE_FRAMES"""
+        if (self._stability_run < self.SKIP_STABLE_FRAMES or self._skip_counter >= self.SKIP_MAX_CONSECUTIVE
+                or self._skip_reference is None or not self.is_position_locked):
+            return False
+
+        small = self._pupil_square_small(gray_frame)
+        if small is None or small.shape != self._skip_reference.shape:
+            return False
+
+        return cv2.norm(small, self._skip_reference, cv2.NORM_L1) / small.size < self.SKIP_DIFF_THRESHOLD
+
+    def _update_skip_state(self, gray_frame, pupil_rotated_rect, final_contours):
+        """Track how long the pupil has been steady after a fully processed frame"""
+        # No pupil (blink, pupil lost) leaves is_pupil_pos_within_threshold from an earlier frame and
+        # process_frames returns its zero sized placeholder rect, neither counts as a steady frame
+        pupil_found = len(final_contours) > 0 and pupil_rotated_rect[1][0] > 0
+        well_within = (pupil_found and self.is_position_locked and self.is_pupil_pos_within_threshold
+                       and self.sq_distance_between_pupilpos_and_lockpos * 4 < self._lockpos_threshold_sq)
+        self._stability_run = self._stability_run + 1 if well_within else 0
+        self._skip_counter = 0
+        self._last_rotated_rect = pupil_rotated_rect if pupil_found else None
+        self._skip_reference = self._pupil_square_small(gray_frame) if well_within else None
+
+    def _find_darkest_point(self, frame, gray_frame):
+        """
+        Darkest point search with temporal coherence
+
+        Once the pupil has stayed put for DARKEST_STABLE_FRAMES full searches only a small window
+        around the previous point is searched. Leaving the window or a change in darkness drops back
+        to full searches until the point is steady again, and a stale cache forces one.
+        """
+        cache = self._darkest_cache
+        tracking_failed = False
+        if (cache is not None and self._stable_frame_count >= self.DARKEST_STABLE_FRAMES
+                and cache[2] < self.DARKEST_FULL_SEARCH_INTERVAL):
+            prev_pos, prev_value, frames_since_full = cache
+            pos = EyeTrackerUtils.get_darkest_area_near(gray_frame, prev_pos, self.DARKEST_SEARCH_RADIUS)
+            if (pos is not None
+                    and abs(pos[0] - prev_pos[0]) <= self.DARKEST_MAX_SHIFT
+                    and abs(pos[1] - prev_pos[1]) <= self.DARKEST_MAX_SHIFT
+                    and abs(int(gray_frame[pos[1], pos[0]]) - prev_value) <= self.DARKEST_MAX_VALUE_CHANGE):
+                self._darkest_cache = (pos, prev_value, frames_since_full + 1)
+                return pos
+            tracking_failed = True
+
+        pos = EyeTrackerUtils.get_darkest_area_vectorized(frame, gray=gray_frame)
+
+        # Count how long the full search result has been steady
+        steady = (not tracking_failed and cache is not None and pos is not None
+                  and abs(pos[0] - cache[0][0]) <= self.DARKEST_MAX_SHIFT
+                  and abs(pos[1] - cache[0][1]) <= self.DARKEST_MAX_SHIFT)
+        self._stable_frame_count = self._stable_frame_count + 1 if steady else 0
+
+        self._darkest_cache = None if pos is None else (pos, int(gray_frame[pos[1], pos[0]]), 0)
+        return pos
+
+    def _find_darkest_point_low_power(self, frame, gray_frame):
+        """Blur based darkest point search used in low power mode"""
+        return EyeTrackerUtils.get_darkest_area_optimised(frame, gray=gray_frame, box_filter=self._cuda_box_filter)
+
+    def _get_working_buffers(self, shape):
+        """Return working_arrays with the per frame image buffers, reallocated only when the frame size changes"""
+        buffers = self.working_arrays
+        if buffers['gray'] is None or buffers['gray'].shape != shape:
+            for key in self.WORKING_BUFFER_KEYS:
+                buffers[key] = np.empty(shape, np.uint8)
+            self._dilated = [buffers['dilated_relaxed'], buffers['dilated_medium'], buffers['dilated_strict']]
+
+        return buffers
+
+    def get_processed_frame(self, draw=True):
+        """Get current frame with processing applied - called by GUI timer
+
+        With draw=False (benchmarking) no visualisation is drawn and the processed,
+        undrawn frame is returned
+        """
         if not self.cap or not self.cap.isOpened():
             return None
         
-        ret, frame = self.cap.read()
-        if not ret:
+        frame = self._next_frame()
+        if frame is None:
             return None
         
         self.frame_count += 1
         
         # Apply all processing steps and return the processed frame
-        processed_frame = self._process_single_frame(frame)
+        return self._process_single_frame(frame, draw=draw)
 
-        if self.frame_count % 50 == 0:
-            print("gc force trash collecting")
-            self.cleanup_frame_data()
+    def _next_frame(self):
+        """Newest captured frame, from the reader thread if running, or None if no frame is available"""
+        if self._reader_thread is None:
+            ret, frame = self.cap.read()
+            return frame if ret else None
 
-        return processed_frame
+        try:
+            frame = self._frame_queue.get(timeout=self.CAPTURE_TIMEOUT)
+        except queue.Empty:
+            return None
+
+        # Drain to the latest frame so processing never falls behind the camera
+        while True:
+            try:
+                frame = self._frame_queue.get_nowait()
+            except queue.Empty:
+                return frame
+
+    def _reader_loop(self):
+        """Capture thread, reads frames into the bounded queue and drops the oldest when it is full"""
+        cap = self.cap # release() clears self.cap, keep the handle this thread reads from
+        try:
+            while True:
+                # Checked and marked under the lock, so release() and set_capture_resolution() see either a
+                # reader that will read again or one that has stopped for good
+                with self._capture_lock:
+                    if self._stop_event.is_set():
+                        self._reader_exited = True
+                        break
+
+                ret, frame = cap.read()
+                if not ret:
+                    # Failed reads are passed on as None so the consumer sees them, like a direct read
+                    frame = None
+                    time.sleep(0.01)
+
+                try:
+                    self._frame_queue.put_nowait(frame)
+                except queue.Full:
+                    try:
+                        self._frame_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    self._frame_queue.put_nowait(frame)
+        finally:
+            # release() timed out waiting for this thread and left the capture for it to release
+            with self._capture_lock:
+                self._reader_exited = True
+                if self._release_capture_on_exit:
+                    cap.release()
+
+    def _start_reader(self):
+        """Start the capture thread"""
+        self._stop_event.clear()
+        self._reader_exited = False
+        self._release_capture_on_exit = False
+        self._reader_thread = threading.Thread(target=self._reader_loop, name="EyeTrackerCapture", daemon=True)
+        self._reader_thread.start()
+
+    def set_capture_resolution(self, width, height):
+        """
+        Request a capture resolution from the camera, e.g. a larger one for calibration
+
+        The reader thread is paused while the camera is reconfigured. Returns the (width, height) the camera
+        actually delivers, which may differ from the request, or None if the camera is not open or the reader
+        could not be paused, in which case nothing is changed.
+        """
+        if not self.cap or not self.cap.isOpened():
+            return None
+
+        reader_running = self._reader_thread is not None
+        if reader_running:
+            self._stop_event.set()
+            self._reader_thread.join(timeout=self.CAPTURE_TIMEOUT)
+            with self._capture_lock:
+                if not self._reader_exited:
+                    # Still blocked in cap.read(), keep that reader and leave the camera as it is rather
+                    # than reconfigure it under the read or start a second reader on the same capture
+                    self._stop_event.clear()
+                    logger.warning("Capture thread did not stop within %.1fs, capture resolution left unchanged",
+                                   self.CAPTURE_TIMEOUT)
+                    return None
+            self._reader_thread = None
+
+        self.cap.set(cv2.CAP_PROP_FOURCC, self.CAPTURE_FOURCC) # Some drivers reset the format with the size
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self._darkest_cache = None # Pixel coordinates change with the resolution
+        self._skip_reference = None
+        self._stable_frame_count = 0
+
+        # Frames already queued have the old size
+        while not self._frame_queue.empty():
+            try:
+                self._frame_queue.get_nowait()
+            except queue.Empty:
+                break
+
+        if reader_running:
+            self._start_reader()
+
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def release(self):
+        """Stop the capture and Arduino threads and release the camera and worker pool"""
+        self._stop_event.set()
+        reader_thread = self._reader_thread
+        if reader_thread is not None:
+            reader_thread.join(timeout=self.CAPTURE_TIMEOUT)
+            self._reader_thread = None
+
+        self._arduino_stop.set()
+        if self._arduino_thread is not None:
+            self._arduino_thread.join(timeout=self.CAPTURE_TIMEOUT)
+            self._arduino_thread = None
+
+        if self.cap is not None:
+            with self._capture_lock:
+                if reader_thread is not None and not self._reader_exited:
+                    # Still blocked in cap.read(), some backends do not survive the capture being released under it
+                    logger.warning("Capture thread did not stop within %.1fs, it releases the camera when it exits",
+                                   self.CAPTURE_TIMEOUT)
+                    self._release_capture_on_exit = True
+                else:
+                    self.cap.release()
+            self.cap = None
+
+        self._pool.shutdown(wait=False)
 
     # def _initialize_camera(self):
     def _initialize_camera(self):
@@ -274,6 +733,9 @@ class EyeTracker():
 
             # Basic low-latency defaults (safe across backends)
             self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self.cap.set(cv2.CAP_PROP_FOURCC, self.CAPTURE_FOURCC)
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.CAPTURE_WIDTH)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.CAPTURE_HEIGHT)
             self.cap.set(cv2.CAP_PROP_GAIN, 0)
             try:
                 self.cap.set(cv2.CAP_PROP_AUTO_WB, 1)
@@ -302,6 +764,11 @@ class EyeTracker():
 
             if not ret:
                 print("Warning: Camera opened but no frames received yet.")
+            if fourcc != self.CAPTURE_FOURCC:
+                print("Warning: Camera does not deliver MJPG, capture may be bandwidth limited.")
+
+            if self.threaded_capture:
+                self._start_reader()
 
             return True
 
@@ -309,74 +776,140 @@ class EyeTracker():
             print(f"Camera initialization error: {str(e)}")
             return False
 
-    def lockpos(self, frame, final_contours):
+    def lockpos(self, frame, final_contours, draw=True):
         """Process pupil position and send appropriate commands to Arduino
         
         Args:
             frame: Video frame to process
             final_contours: Detected pupil contours
-            distance_between_pupilpos_and_lockpos: Distance of pupil from reference point
+            sq_distance_between_pupilpos_and_lockpos: Squared distance of pupil from reference point
             lockpos_threshold: Maximum allowed distance
+            draw: Whether to draw the ellipse, the Arduino command is sent either way
             
         Returns:
             processed_frame
         """        
+        self._last_lock_ellipse = None
+
         # Only process if we have contours
         if not final_contours:
             return frame
             
         # Check if pupil is within allowed distance from reference point
-        if self.distance_between_pupilpos_and_lockpos > self.lockpos_threshold:
+        if self.sq_distance_between_pupilpos_and_lockpos > self._lockpos_threshold_sq:
             # Pupil is outside threshold - draw red ellipse
             self.is_pupil_pos_within_threshold = False
-            frame = EyeTrackerUtils.fit_and_draw_ellipses(frame, final_contours[0], (255, 0, 0))
+            if draw:
+                frame = self._draw_lock_ellipse(frame, final_contours[0], (255, 0, 0))
             command = 'H'
-
-            
-            # Send command to Arduino if tracker is available AND if command is different from previous command (for efficiency) 
-            if self.tracker and self.tracker.is_connected() and command != self.prev_command:
-                result = self.tracker.send_command(command)
-
-                # Add ack cmd checker??
-                
-                if result == 1:
-                    print("OUT OF THRESHOLD command sent and acknowledged")
-                    self.prev_command = command
-                elif result == 2:
-                    print("Error: Program ended by Arduino")
-                    return frame  # Signal to main loop to exit
-                else:
-                    print("Failed to send OUT OF THRESHOLD command")
-                    
             # print("Out of threshold")
         else:
             # Pupil is within threshold - draw green ellipse
             self.is_pupil_pos_within_threshold = True
-            frame = EyeTrackerUtils.fit_and_draw_ellipses(frame, final_contours[0], (0, 255, 0))
+            if draw:
+                frame = self._draw_lock_ellipse(frame, final_contours[0], (0, 255, 0))
             command = 'L'
+
+        # Send command to Arduino if tracker is available AND if command is different from previous command (for efficiency) 
+        self._queue_command(command)
             
-            # Send command to Arduino if tracker is available
-            if self.tracker and self.tracker.is_connected() and command != self.prev_command:
-                result = self.tracker.send_command(command)
-                
+        return frame
+
+    def _draw_lock_ellipse(self, frame, contour, color):
+        """Draw the ellipse fitted to the contour as EyeTrackerUtils.fit_and_draw_ellipses does, and keep it
+        so frames skipped by the adaptive frame skip show the same ellipse"""
+        if len(contour) < 5:
+            print("Not enough points to fit an ellipse.")
+            return frame
+
+        ellipse = cv2.fitEllipse(np.array(contour, dtype=np.int32).reshape((-1, 1, 2)))
+        cv2.ellipse(frame, ellipse, color, 2)
+        self._last_lock_ellipse = (ellipse, color)
+        return frame
+
+    def _queue_command(self, command):
+        """Hand a command to the Arduino worker without waiting, replacing any command it has not sent yet"""
+        if not self.tracker or not self.tracker.is_connected():
+            return
+
+        with self._command_lock:
+            if command == self._queued_command:
+                return
+            self._queued_command = command
+            try:
+                self._command_queue.put_nowait(command)
+            except queue.Full:
+                try:
+                    self._command_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._command_queue.put_nowait(command)
+
+    def _arduino_loop(self):
+        """Arduino worker thread, sends queued commands and reports the result"""
+        while not self._arduino_stop.is_set():
+            try:
+                command = self._command_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            label = "OUT OF THRESHOLD" if command == 'H' else "WITHIN THRESHOLD"
+            result = self.tracker.send_command(command)
+
+            with self._command_lock:
                 if result == 1:
-                    print("WITHIN THRESHOLD command sent and acknowledged")
                     self.prev_command = command
-                elif result == 2:
-                    print("Program ended by Arduino")
-                    return frame
-                else:
-                    print("Failed to send WITHIN THRESHOLD command")
-            
-        return frame
+                # Not sent, let the next frame queue it again unless a newer command is already waiting
+                elif self._queued_command == command:
+                    self._queued_command = self.prev_command
+
+            if result == 1:
+                logger.debug("%s command sent and acknowledged", label)
+            elif result == 2:
+                logger.error("Program ended by Arduino")
+            else:
+                logger.warning("Failed to send %s command", label)
     
     def set_power(self, value):
-        """Set the threshold value based on slider in GUI"""
+        """Set the power mode based on the GUI, binding the darkest point search and contour optimiser for it"""
         self.power_optimisation = value
+        if value == self.LOW_POWER:
+            self._get_darkest = self._find_darkest_point_low_power
+            self._scoring_scale = self.LOW_POWER_SCORING_SCALE
+        else:
+            self._get_darkest = self._find_darkest_point
+            self._scoring_scale = 1
+
+        if value == self.HIGH_POWER:
+            self._optimize_contours = EyeTrackerUtils.optimize_contours_by_angle
+        else:
+            self._optimize_contours = EyeTrackerUtils.optimize_contours_by_angle_vectorised
     
+    def set_opencl(self, enabled):
+        """Enable or disable the OpenCL path, stays off when OpenCV has no usable OpenCL device"""
+        self.use_opencl = bool(enabled) and cv2.ocl.haveOpenCL()
+        cv2.ocl.setUseOpenCL(self.use_opencl)
+        if enabled and not self.use_opencl:
+            print("OpenCL not available, using the CPU path")
+
+    def set_cuda(self, enabled):
+        """Enable or disable the CUDA dilation and low power darkest point paths, stays off when OpenCV was built without a CUDA device"""
+        has_cuda = hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+        if enabled and has_cuda:
+            self._cuda_dilate = {self.working_arrays[key].shape: cv2.cuda.createMorphologyFilter(cv2.MORPH_DILATE, cv2.CV_8UC1, self.working_arrays[key])
+                                 for key in ('kernel9', 'kernel5')}
+            # Same box as get_darkest_area_optimised's searchArea
+            self._cuda_box_filter = cv2.cuda.createBoxFilter(cv2.CV_8UC1, cv2.CV_8UC1, (20, 20))
+        else:
+            self._cuda_dilate = None
+            self._cuda_box_filter = None
+            if enabled:
+                print("CUDA not available, using the CPU path")
+
     def set_threshold(self, value):
         """Set the threshold value based on slider in GUI"""
         self.lockpos_threshold = value
+        self._lockpos_threshold_sq = value ** 2
 
     def set_confidence_margin(self, value):
         """Set the threshold value based on slider in GUI"""
@@ -391,6 +924,9 @@ class EyeTracker():
         """
         self.zoom_factor = value
         self.zoom_center = center 
+        self._darkest_cache = None # Pixel coordinates change with zoom
+        self._skip_reference = None
+        self._stable_frame_count = 0
     
     def lock_position(self):
         """Lock the current eye position as reference point"""
@@ -405,6 +941,11 @@ class EyeTracker():
             self.is_position_locked = False
 
         return
+
+    @property
+    def distance_between_pupilpos_and_lockpos(self):
+        """Distance of the pupil from the locked position, the sqrt is only taken when this is read (e.g. for display)"""
+        return self.sq_distance_between_pupilpos_and_lockpos ** 0.5
     
     def is_eye_in_position(self):
         """Check if eye is in the calibrated position
@@ -419,17 +960,3 @@ class EyeTracker():
             return False
         
         return self.is_pupil_pos_within_threshold
-    
-    # Add to your frame processing loop
-    def cleanup_frame_data(self):
-        """Clean up temporary arrays and matrices"""
-        if hasattr(self, '_temp_arrays'):
-            for arr in self._temp_arrays:
-                if arr is not None:
-                    del arr
-
-        gc.collect()  # Force garbage collection
-        self.frame_count = 0
-
-
-
@@ -1,9 +1,37 @@
 import cv2
 import numpy as np
+import threading
+
+from app.core._pupil_kernels import angle_filter_mask, largest_contour_index, sampled_block_sums
+
+# Threshold on the dot product of a point's average neighbour direction with its direction to the centroid
+_COS_60 = float(np.cos(np.radians(60)))
+
+# Per thread mask buffers for the contour checks, thresholds are scored concurrently on the tracker's pool
+_scratch = threading.local()
 
 class EyeTrackerUtils:
     # Image Processing Functions
 
+    #returns two uint8 mask buffers of the given shape, reused by every call on the same thread
+    #the contents are left over from the previous call, callers clear them before drawing
+    @staticmethod
+    def _scratch_masks(shape):
+        masks = getattr(_scratch, 'masks', None)
+        if masks is None or masks[0].shape != shape:
+            masks = (np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=np.uint8))
+            _scratch.masks = masks
+        return masks
+
+    #returns image unchanged if OpenCV can use it in place, otherwise a C-contiguous copy
+    #row padding (crops of a larger buffer) is fine for OpenCV, only a strided or transposed pixel layout forces a copy
+    @staticmethod
+    def _opencv_compatible(image):
+        pixel_bytes = image.itemsize * (image.shape[2] if image.ndim == 3 else 1)
+        if image.strides[1] != pixel_bytes or (image.ndim == 3 and image.strides[2] != image.itemsize):
+            return np.ascontiguousarray(image)
+        return image
+
     # Crop the image to maintain a specific aspect ratio (width:height)
     @staticmethod
     def crop_to_aspect_ratio(image, width=640, height=480):
@@ -44,15 +72,24 @@ class EyeTrackerUtils:
             offset = (current_height - new_height) // 2
             cropped_img = image[offset:offset+new_height, :]
 
-        return cv2.resize(cropped_img, (width, height))
+        # Already the requested size, skip the resize copy
+        crop_height, crop_width = cropped_img.shape[:2]
+        if crop_width == width and crop_height == height:
+            return cropped_img
+
+        # Area interpolation when shrinking, bilinear when enlarging
+        interpolation = cv2.INTER_AREA if crop_width > width else cv2.INTER_LINEAR
+        return cv2.resize(cropped_img, (width, height), interpolation=interpolation)
     
-    # Apply thresholding to an image
+    # Apply thresholding to an image, writing into dst when a preallocated buffer is given
+    # Pixels must be contiguous along each row, other layouts are copied first
     @staticmethod
-    def apply_binary_threshold(image, darkestPixelValue, addedThreshold):
-        # Calculate the threshold as the sum of the two input values
-        threshold = darkestPixelValue + addedThreshold
+    def apply_binary_threshold(image, darkestPixelValue, addedThreshold, dst=None):
+        image = EyeTrackerUtils._opencv_compatible(image)
+        # Calculate the threshold as the sum of the two input values (as int, a uint8 pixel value would wrap around)
+        threshold = int(darkestPixelValue) + addedThreshold
         # Apply the binary threshold
-        _, thresholded_image = cv2.threshold(image, threshold, 255, cv2.THRESH_BINARY_INV)
+        _, thresholded_image = cv2.threshold(image, threshold, 255, cv2.THRESH_BINARY_INV, dst=dst)
         
         return thresholded_image
     
@@ -78,36 +115,22 @@ class EyeTrackerUtils:
             center_x = int(w * center[0])
             center_y = int(h * center[1])
         
-        # Calculate the new dimensions
-        new_w = int(w / zoom_factor)
-        new_h = int(h / zoom_factor)
-        
-        # Calculate the cropping box
-        x = max(center_x - new_w // 2, 0)
-        y = max(center_y - new_h // 2, 0)
-        
-        # Ensure we're not exceeding frame bounds
-        if x + new_w > w:
-            x = w - new_w
-        if y + new_h > h:
-            y = h - new_h
-        
-        # Ensure cropping box dimensions are valid
-        x = max(0, x)
-        y = max(0, y)
-        x2 = min(x + new_w, w)
-        y2 = min(y + new_h, h)
-        
-        # Crop and resize the frame
-        cropped_frame = frame[y:y2, x:x2]
-        
-        # Check if we have valid dimensions before resizing
-        if cropped_frame.shape[0] > 0 and cropped_frame.shape[1] > 0:
-            zoomed_frame = cv2.resize(cropped_frame, (w, h))
-            return zoomed_frame
-        else:
-            # Return original frame if cropping resulted in an invalid size
+        # Calculate the new dimensions, no larger than the frame
+        new_w = min(int(w / zoom_factor), w)
+        new_h = min(int(h / zoom_factor), h)
+        
+        # Return original frame if the zoom leaves nothing to crop
+        if new_w <= 0 or new_h <= 0:
             return frame
+        
+        # Cropping box centred on the zoom center, shifted back inside the frame at the edges
+        # (an integer crop, unlike cv2.getRectSubPix which interpolates and replicates the border)
+        x = min(max(center_x - new_w // 2, 0), w - new_w)
+        y = min(max(center_y - new_h // 2, 0), h - new_h)
+        
+        # Crop and resize the frame, area interpolation when shrinking and bilinear when enlarging
+        interpolation = cv2.INTER_LINEAR if zoom_factor >= 1 else cv2.INTER_AREA
+        return cv2.resize(frame[y:y + new_h, x:x + new_w], (w, h), interpolation=interpolation)
 
     # Contour Detection and Processing
     #mask all pixels outside a square defined by center and size
@@ -116,8 +139,8 @@ class EyeTrackerUtils:
         x, y = center
         half_size = size // 2
 
-        # Create a mask initialized to black
-        mask = np.zeros_like(image)
+        # Output initialized to black
+        masked_image = np.zeros_like(image)
 
         # Calculate the top-left corner of the square
         top_left_x = max(0, x - half_size)
@@ -127,11 +150,8 @@ class EyeTrackerUtils:
         bottom_right_x = min(image.shape[1], x + half_size)
         bottom_right_y = min(image.shape[0], y + half_size)
 
-        # Set the square area in the mask to white
-        mask[top_left_y:bottom_right_y, top_left_x:bottom_right_x] = 255
-
-        # Apply the mask to the image
-        masked_image = cv2.bitwise_and(image, mask)
+        # Copy only the square area of the image, no mask needed
+        masked_image[top_left_y:bottom_right_y, top_left_x:bottom_right_x] = image[top_left_y:bottom_right_y, top_left_x:bottom_right_x]
 
         return masked_image
     
@@ -140,49 +160,35 @@ class EyeTrackerUtils:
         if len(contours) < 1:
             return contours
 
-        # Holds the candidate points
-        all_contours = np.concatenate(contours[0], axis=0)
+        # Holds the candidate points, the (n, 1, 2) contour viewed as (n, 2) rather than concatenated row by row
+        all_contours = np.asarray(contours[0]).reshape(-1, 2)
+
+        n_points = len(all_contours)
 
         # Set spacing based on size of contours
-        spacing = int(len(all_contours)/25)  # Spacing between sampled points
+        spacing = int(n_points/25)  # Spacing between sampled points
 
-        # Temporary array for result
-        filtered_points = []
-        
         # Calculate centroid of the original contours
         centroid = np.mean(all_contours, axis=0)
-        
-        # # Create an image of the same size as the original image
-        # point_image = image.copy()
-        
-        # skip = 0
-        
-        # Loop through each point in the all_contours array
-        for i in range(0, len(all_contours), 1):
-        
-            # Get three points: current point, previous point, and next point
-            current_point = all_contours[i]
-            prev_point = all_contours[i - spacing] if i - spacing >= 0 else all_contours[-spacing]
-            next_point = all_contours[i + spacing] if i + spacing < len(all_contours) else all_contours[spacing]
-            
-            # Calculate vectors between points
-            vec1 = prev_point - current_point
-            vec2 = next_point - current_point
-            
-            with np.errstate(invalid='ignore'):
-                # Calculate angles between vectors
-                angle = np.arccos(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
-
-            # Calculate vector from current point to centroid
-            vec_to_centroid = centroid - current_point
-            
-            # Check if angle is oriented towards centroid
-            # Calculate the cosine of the desired angle threshold (e.g., 80 degrees)
-            cos_threshold = np.cos(np.radians(60))  # Convert angle to radians
-            
-            if np.dot(vec_to_centroid, (vec1+vec2)/2) >= cos_threshold:
-                filtered_points.append(current_point)
-        
+
+        # Separate contiguous x and y arrays, the gathers and arithmetic below then work on plain scalars
+        xs = np.ascontiguousarray(all_contours[:, 0])
+        ys = np.ascontiguousarray(all_contours[:, 1])
+
+        # Previous and next point for every point at once, the end points wrap onto the point
+        # spacing away from the other end
+        indices = np.arange(n_points)
+        prev_indices = np.where(indices >= spacing, indices - spacing, n_points - spacing)
+        next_indices = np.where(indices + spacing < n_points, indices + spacing, spacing)
+
+        # Sum of the vectors to both neighbours
+        vec_sum_x = (xs[prev_indices] - xs) + (xs[next_indices] - xs)
+        vec_sum_y = (ys[prev_indices] - ys) + (ys[next_indices] - ys)
+
+        # Keep points whose average direction to their neighbours is oriented towards the centroid
+        centroid_dots = (centroid[0] - xs) * (vec_sum_x / 2) + (centroid[1] - ys) * (vec_sum_y / 2)
+        filtered_points = all_contours[centroid_dots >= _COS_60]
+
         return np.array(filtered_points, dtype=np.int32).reshape((-1, 1, 2))
     
     def optimize_contours_by_angle_vectorised(contours, image):
@@ -190,11 +196,12 @@ class EyeTrackerUtils:
         if len(contours) < 1:
             return contours
 
-        # Get all contour points
-        all_contours = np.concatenate(contours[0], axis=0)
+        # Get all contour points as an (n, 2) view
+        all_contours = np.asarray(contours[0]).reshape(-1, 2)
         n_points = len(all_contours)
         
-        if n_points < 3:
+        # Too few points to fit an ellipse to whatever survives the filter, skip it
+        if n_points < 5:
             return all_contours.reshape((-1, 1, 2))
         
         # Set spacing based on size of contours (but limit the range)
@@ -203,78 +210,14 @@ class EyeTrackerUtils:
         # Pre-calculate centroid once
         centroid = np.mean(all_contours, axis=0)
         
-        # Pre-calculate cosine threshold
-        cos_threshold = np.cos(np.radians(60))
-        
-        # Vectorized approach for better performance
-        filtered_indices = []
-        
-        # Process points in batches to reduce memory usage
-        batch_size = min(1000, n_points)
-        
-        for batch_start in range(0, n_points, batch_size):
-            batch_end = min(batch_start + batch_size, n_points)
-            batch_indices = np.arange(batch_start, batch_end)
-            
-            # Get current points for this batch
-            current_points = all_contours[batch_indices]
-            
-            # Calculate previous and next indices with wrapping
-            prev_indices = (batch_indices - spacing) % n_points
-            next_indices = (batch_indices + spacing) % n_points
-            
-            # Get previous and next points
-            prev_points = all_contours[prev_indices]
-            next_points = all_contours[next_indices]
-            
-            # Calculate vectors (vectorized)
-            vec1 = prev_points - current_points
-            vec2 = next_points - current_points
-            
-            # Calculate norms once and reuse
-            norm1 = np.linalg.norm(vec1, axis=1)
-            norm2 = np.linalg.norm(vec2, axis=1)
-            
-            # Avoid division by zero
-            valid_norms = (norm1 > 1e-8) & (norm2 > 1e-8)
-            
-            if np.any(valid_norms):
-                # Calculate dot products (vectorized)
-                dot_products = np.sum(vec1 * vec2, axis=1)
-                
-                # Calculate angles only for valid points
-                valid_mask = valid_norms
-                angles = np.full(len(batch_indices), np.pi)  # Default to pi for invalid points
-                
-                with np.errstate(invalid='ignore', divide='ignore'):
-                    cos_angles = dot_products[valid_mask] / (norm1[valid_mask] * norm2[valid_mask])
-                    # Clamp to valid range for arccos
-                    cos_angles = np.clip(cos_angles, -1.0, 1.0)
-                    angles[valid_mask] = np.arccos(cos_angles)
-                
-                # Calculate vectors to centroid (vectorized)
-                vec_to_centroid = centroid - current_points
-                
-                # Calculate average direction vectors
-                avg_directions = (vec1 + vec2) / 2
-                
-                # Calculate dot products with centroid direction (vectorized)
-                centroid_dots = np.sum(vec_to_centroid * avg_directions, axis=1)
-                
-                # Apply filtering criteria
-                angle_filter = angles < np.radians(180)  # Reasonable angle threshold
-                centroid_filter = centroid_dots >= cos_threshold
-                
-                # Combine filters
-                final_filter = valid_mask & angle_filter & centroid_filter
-                
-                # Add valid indices to result
-                valid_batch_indices = batch_indices[final_filter]
-                filtered_indices.extend(valid_batch_indices)
+        # Filter all points in one compiled pass
+        keep = np.empty(n_points, dtype=np.bool_)
+        angle_filter_mask(np.ascontiguousarray(all_contours, dtype=np.int32), spacing,
+                          float(centroid[0]), float(centroid[1]), _COS_60, keep)
         
         # Return filtered points
-        if filtered_indices:
-            filtered_points = all_contours[filtered_indices]
+        if keep.any():
+            filtered_points = all_contours[keep]
             return filtered_points.reshape((-1, 1, 2))
         else:
             # Fallback: return evenly spaced points if no points pass the filter
@@ -286,33 +229,18 @@ class EyeTrackerUtils:
     #contours is the list of contours, pixel_thresh is the max pixels to filter, and ratio_thresh is the max ratio
     @staticmethod
     def filter_contours_by_area_and_return_largest(contours, pixel_thresh, ratio_thresh):
-        max_area = 0
-        largest_contour = None
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area >= pixel_thresh:
-                x, y, w, h = cv2.boundingRect(contour)
-                length = max(w, h)
-                width = min(w, h)
-
-                # Calculate the length-to-width ratio and width-to-length ratio
-                length_to_width_ratio = length / width
-                width_to_length_ratio = width / length
-
-                # Pick the higher of the two ratios
-                current_ratio = max(length_to_width_ratio, width_to_length_ratio)
-
-                # Check if highest ratio is within the acceptable threshold
-                if current_ratio <= ratio_thresh:
-                    # Update the largest contour if the current one is bigger
-                    if area > max_area:
-                        max_area = area
-                        largest_contour = contour
+        if len(contours) == 0:
+            return []
+
+        # Area and length-to-width ratio checks run in one compiled pass over all contour points
+        bounds = np.zeros(len(contours) + 1, dtype=np.int64)
+        np.cumsum([len(contour) for contour in contours], out=bounds[1:])
+        points = np.concatenate(contours).reshape(-1, 2)
+        largest_index = largest_contour_index(points, bounds, float(pixel_thresh), float(ratio_thresh))
 
         # Return a list with only the largest contour, or an empty list if no contour was found
-        if largest_contour is not None:
-            return [largest_contour]
+        if largest_index >= 0:
+            return [contours[largest_index]]
         else:
             return []
 
@@ -343,84 +271,49 @@ class EyeTrackerUtils:
         if len(contour) < 5:
             return [0, 0]  # Not enough points to fit an ellipse
         
-        # Create an empty mask for the contour
-        contour_mask = np.zeros(image_shape, dtype=np.uint8)
-        # Draw the contour on the mask, filling it
+        # Draw the contour outline on a cleared scratch mask
+        contour_mask, ellipse_mask = EyeTrackerUtils._scratch_masks(tuple(image_shape[:2]))
+        contour_mask.fill(0)
         cv2.drawContours(contour_mask, [contour], -1, (255), 1)
     
-        # Fit an ellipse to the contour and create a mask for the ellipse
-        ellipse_mask_thick = np.zeros(image_shape, dtype=np.uint8)
-        ellipse_mask_thin = np.zeros(image_shape, dtype=np.uint8)
-        ellipse = cv2.fitEllipse(contour)
+        # Fit an ellipse to the contour
+        ellipse = cv2.fitEllipseDirect(contour)
         
-        # Draw the ellipse with a specific thickness
-        cv2.ellipse(ellipse_mask_thick, ellipse, (255), 10) #capture more for absolute
-        cv2.ellipse(ellipse_mask_thin, ellipse, (255), 4) #capture fewer for ratio
+        # Overlap with a thick outline of the ellipse, drawn into the second scratch mask
+        ellipse_mask.fill(0)
+        cv2.ellipse(ellipse_mask, ellipse, (255), 10) #capture more for absolute
+        absolute_pixel_total_thick = cv2.countNonZero(cv2.bitwise_and(contour_mask, ellipse_mask, dst=ellipse_mask))
 
-        # Calculate the overlap of the contour mask and the thickened ellipse mask
-        overlap_thick = cv2.bitwise_and(contour_mask, ellipse_mask_thick)
-        overlap_thin = cv2.bitwise_and(contour_mask, ellipse_mask_thin)
-        
-        # Count the number of non-zero (white) pixels in the overlap
-        absolute_pixel_total_thick = np.sum(overlap_thick > 0)#compute with thicker border
-        absolute_pixel_total_thin = np.sum(overlap_thin > 0)#compute with thicker border
+        # Overlap with a thin outline, a new array as it is returned to the caller
+        ellipse_mask.fill(0)
+        cv2.ellipse(ellipse_mask, ellipse, (255), 4) #capture fewer for ratio
+        overlap_thin = cv2.bitwise_and(contour_mask, ellipse_mask)
+        absolute_pixel_total_thin = cv2.countNonZero(overlap_thin)
         
         # Compute the ratio of pixels under the ellipse to the total pixels on the contour border
-        total_border_pixels = np.sum(contour_mask > 0)
+        total_border_pixels = cv2.countNonZero(contour_mask)
         
         ratio_under_ellipse = absolute_pixel_total_thin / total_border_pixels if total_border_pixels > 0 else 0
         
         return [absolute_pixel_total_thick, ratio_under_ellipse, overlap_thin]
 
     
-    #Finds a square area of dark pixels in the image, original brute force method, just left here for reference
+    #Finds a square area of dark pixels in the image, kept for older callers
+    #The original brute force loop is gone, get_darkest_area_vectorized searches the same grid with the same
+    #sampling and returns the same point
     #@param I input image (converted to grayscale during search process)
     #@return a point within the pupil region
     @staticmethod
     def get_darkest_area(image):
-        if image is None:
-            print("Error: Image not loaded properly")
-            return None
-
-        ignoreBounds = 20
-        imageSkipSize = 10
-        searchArea = 20
-        internalSkipSize = 5
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-        min_sum = float('inf')
-        darkest_point = None
-
-        # Loop over the image with spacing defined by imageSkipSize, ignoring the boundaries
-        for y in range(ignoreBounds, gray.shape[0] - ignoreBounds - searchArea, imageSkipSize):
-            for x in range(ignoreBounds, gray.shape[1] - ignoreBounds - searchArea, imageSkipSize):
-
-                current_sum = 0
-                num_pixels = 0
-                for dy in range(0, searchArea, internalSkipSize):
-                    if (y + dy) >= gray.shape[0]:
-                        break
-                    for dx in range(0, searchArea, internalSkipSize):
-                        if (x + dx) >= gray.shape[1]:
-                            break
-
-                        current_sum = current_sum + gray[y + dy,x + dx].astype(np.int32)
-                        num_pixels += 1
-
-                # Update the darkest point if the current block is darker
-                if current_sum < min_sum and num_pixels > 0:
-                    min_sum = current_sum
-                    darkest_point = (x + searchArea // 2, y + searchArea // 2)  # Center of the block
-                
-        return darkest_point
+        return EyeTrackerUtils.get_darkest_area_vectorized(image)
     
     #Finds a square area of dark pixels in the image, uses blur to average darkness of kernel rather than brute force calc
     #@param I input image (converted to grayscale during search process)
+    #@param gray optional grayscale version of the image, skips the conversion when the caller already has it
+    #@param box_filter optional cv2.cuda box filter (CV_8UC1, 20x20), blurs on the CUDA device instead
     #@return a point within the pupil region    
     @staticmethod
-    def get_darkest_area_optimised(image):
+    def get_darkest_area_optimised(image, gray=None, box_filter=None):
         if image is None:
             print("Error: Image not loaded properly")
             return None
@@ -430,16 +323,29 @@ class EyeTrackerUtils:
         imageSkipSize = 10
 
         # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
         # Crop the image to ignore bounds
         cropped = gray[ignoreBounds:-ignoreBounds, ignoreBounds:-ignoreBounds]
 
-        # Use box filter to compute average pixel values in blocks
-        blurred = cv2.blur(cropped, (searchArea, searchArea))  # or cv2.boxFilter with normalize=True
+        if box_filter is not None:
+            # Blur on the CUDA device, only the blurred frame comes back for the grid sampling
+            gpu_cropped = cv2.cuda_GpuMat()
+            gpu_cropped.upload(np.ascontiguousarray(cropped))
+            blurred = box_filter.apply(gpu_cropped).download()
+            downsampled = blurred[::imageSkipSize, ::imageSkipSize]
+        elif min(gray.shape[:2]) > 720:
+            # Large frames: halve the resolution first and search the half size grid with a half size box,
+            # each grid step still maps back to imageSkipSize pixels
+            blurred = cv2.blur(cv2.pyrDown(cropped), (searchArea // 2, searchArea // 2))
+            downsampled = blurred[::imageSkipSize // 2, ::imageSkipSize // 2]
+        else:
+            # Use box filter to compute average pixel values in blocks
+            blurred = cv2.blur(cropped, (searchArea, searchArea))  # or cv2.boxFilter with normalize=True
 
-        # Downsample the blurred image to simulate skipping
-        downsampled = blurred[::imageSkipSize, ::imageSkipSize]
+            # Downsample the blurred image to simulate skipping
+            downsampled = blurred[::imageSkipSize, ::imageSkipSize]
 
         # Find the location of the minimum average value (darkest)
         min_loc = np.unravel_index(np.argmin(downsampled), downsampled.shape)
@@ -451,11 +357,12 @@ class EyeTrackerUtils:
 
         return (x_orig, y_orig)
 
-    #Finds a square area of dark pixels in the image, uses np calc and vectors for speed, same output as brute force
+    #Finds a square area of dark pixels in the image, uses np calc and vectors for speed, same output as the original brute force loop
     #@param I input image (converted to grayscale during search process)
+    #@param gray optional grayscale version of the image, skips the conversion when the caller already has it
     #@return a point within the pupil region    
     @staticmethod 
-    def get_darkest_area_vectorized(image):
+    def get_darkest_area_vectorized(image, gray=None):
         if image is None:
             print("Error: Image not loaded properly")
             return None
@@ -466,29 +373,21 @@ class EyeTrackerUtils:
         internalSkipSize = 5
         
         # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.int32)
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # Calculate dimensions
         h, w = gray.shape
         valid_h = h - 2 * ignoreBounds - searchArea
         valid_w = w - 2 * ignoreBounds - searchArea
         
-        # Number of positions to check
+        # Sum every searchArea block on the grid, sampled every internalSkipSize pixels, in one compiled pass
         num_y = len(range(0, valid_h, imageSkipSize))
         num_x = len(range(0, valid_w, imageSkipSize))
-        
-        # Pre-allocate results array
-        sums = np.full((num_y, num_x), float('inf'))
-        
-        # Calculate all sums
-        for i, y_offset in enumerate(range(0, valid_h, imageSkipSize)):
-            for j, x_offset in enumerate(range(0, valid_w, imageSkipSize)):
-                y = ignoreBounds + y_offset
-                x = ignoreBounds + x_offset
-                
-                # Extract and sample block
-                block = gray[y:y+searchArea:internalSkipSize, x:x+searchArea:internalSkipSize]
-                sums[i, j] = np.sum(block)
+        sums = np.empty((num_y, num_x), dtype=np.int32)
+        sampled_block_sums(gray, ignoreBounds, ignoreBounds, imageSkipSize, searchArea, internalSkipSize, sums)
+        if sums.size == 0:
+            return None
         
         # Find minimum
         min_idx = np.unravel_index(np.argmin(sums), sums.shape)
@@ -499,11 +398,53 @@ class EyeTrackerUtils:
         x_orig = ignoreBounds + min_j * imageSkipSize + searchArea // 2
         
         return (x_orig, y_orig)
+
+    #Same search as get_darkest_area_vectorized but only over the grid blocks centred within radius of center
+    #@param gray grayscale image
+    #@param center (x, y) point to search around, usually the previous frame's darkest point
+    #@return a point within the pupil region, or None if no grid block lies in the window
+    @staticmethod
+    def get_darkest_area_near(gray, center, radius=64):
+        ignoreBounds = 20
+        imageSkipSize = 10
+        searchArea = 20
+        internalSkipSize = 5
+
+        # Grid dimensions, identical to the full search
+        h, w = gray.shape
+        num_y = len(range(0, h - 2 * ignoreBounds - searchArea, imageSkipSize))
+        num_x = len(range(0, w - 2 * ignoreBounds - searchArea, imageSkipSize))
+
+        # Range of grid indices whose block centre lies inside the window
+        first = ignoreBounds + searchArea // 2
+        i0 = max(0, -(-(center[1] - radius - first) // imageSkipSize))
+        i1 = min(num_y, (center[1] + radius - first) // imageSkipSize + 1)
+        j0 = max(0, -(-(center[0] - radius - first) // imageSkipSize))
+        j1 = min(num_x, (center[0] + radius - first) // imageSkipSize + 1)
+        if i0 >= i1 or j0 >= j1:
+            return None
+
+        # Accumulate the sampled block sums for the whole window with one strided slice per sample offset
+        n_y, n_x = i1 - i0, j1 - j0
+        y0 = ignoreBounds + i0 * imageSkipSize
+        x0 = ignoreBounds + j0 * imageSkipSize
+        sums = np.zeros((n_y, n_x), np.int32)
+        for dy in range(0, searchArea, internalSkipSize):
+            for dx in range(0, searchArea, internalSkipSize):
+                sums += gray[y0 + dy:y0 + dy + n_y * imageSkipSize:imageSkipSize,
+                             x0 + dx:x0 + dx + n_x * imageSkipSize:imageSkipSize]
+
+        min_i, min_j = np.unravel_index(np.argmin(sums), sums.shape)
+
+        # Convert back to original coordinates
+        return (x0 + min_j * imageSkipSize + searchArea // 2, y0 + min_i * imageSkipSize + searchArea // 2)
     
     #outside of this method, select the ellipse with the highest percentage of pixels under the ellipse 
     #TODO for efficiency, work with downscaled or cropped images
+    #binary_image pixels must be contiguous along each row, other layouts are copied first
     @staticmethod
     def check_ellipse_goodness(binary_image, contour):
+        binary_image = EyeTrackerUtils._opencv_compatible(binary_image)
         ellipse_goodness = [0,0,0] #covered pixels, edge straightness stdev, skewedness   
         # Check if the contour can be used to fit an ellipse (requires at least 5 points)
         if len(contour) < 5:
@@ -511,19 +452,20 @@ class EyeTrackerUtils:
             return 0  # Not enough points to fit an ellipse
         
         # Fit an ellipse to the contour
-        ellipse = cv2.fitEllipse(contour)
+        ellipse = cv2.fitEllipseDirect(contour)
         
-        # Create a mask with the same dimensions as the binary image, initialized to zero (black)
-        mask = np.zeros_like(binary_image)
+        # Clear a scratch mask with the same dimensions as the binary image
+        _, mask = EyeTrackerUtils._scratch_masks(binary_image.shape)
+        mask.fill(0)
         
         # Draw the ellipse on the mask with white color (255)
         cv2.ellipse(mask, ellipse, (255), -1)
         
         # Calculate the number of pixels within the ellipse
-        ellipse_area = np.sum(mask == 255)
+        ellipse_area = cv2.countNonZero(mask)
         
-        # Calculate the number of white pixels within the ellipse
-        covered_pixels = np.sum((binary_image == 255) & (mask == 255))
+        # Calculate the number of white pixels within the ellipse (binary images only hold 0 and 255)
+        covered_pixels = cv2.countNonZero(cv2.bitwise_and(binary_image, mask, dst=mask))
         
         # Calculate the percentage of covered white pixels within the ellipse
         if ellipse_area == 0:
@@ -539,4 +481,48 @@ class EyeTrackerUtils:
         # minor_axis_length = axes_lengths[0]
         ellipse_goodness[2] = min(ellipse[1][1]/ellipse[1][0], ellipse[1][0]/ellipse[1][1])
         
-        return ellipse_goodness
\ No newline at end of file
+        return ellipse_goodness
+
+    #check_ellipse_goodness and check_contour_pixels in one call, the ellipse is fitted once and
+    #the contour and ellipse masks are shared between both metrics
+    #binary_image pixels must be contiguous along each row, other layouts are copied first
+    #@return (ellipse_goodness, [absolute_pixel_total_thick, ratio_under_ellipse, overlap_thin]), same values as the two methods
+    @staticmethod
+    def evaluate_contour(binary_image, contour):
+        binary_image = EyeTrackerUtils._opencv_compatible(binary_image)
+        ellipse_goodness = [0,0,0] #covered pixels, edge straightness stdev, skewedness
+        # Check if the contour can be used to fit an ellipse (requires at least 5 points)
+        if len(contour) < 5:
+            return ellipse_goodness, [0, 0]
+
+        # Fit the ellipse once for both metrics, with the same direct (algebraic) fit the tracker
+        # uses for the selected contour
+        ellipse = cv2.fitEllipseDirect(contour)
+
+        # Goodness: share of white pixels under the filled ellipse (images only hold 0 and 255)
+        contour_mask, mask = EyeTrackerUtils._scratch_masks(binary_image.shape)
+        mask.fill(0)
+        cv2.ellipse(mask, ellipse, (255), -1)
+        ellipse_area = cv2.countNonZero(mask)
+        if ellipse_area > 0:
+            ellipse_goodness[0] = cv2.countNonZero(cv2.bitwise_and(binary_image, mask, dst=mask)) / ellipse_area
+            if ellipse[1][0] > 0 and ellipse[1][1] > 0:
+                ellipse_goodness[2] = min(ellipse[1][1]/ellipse[1][0], ellipse[1][0]/ellipse[1][1])
+
+        # Contour pixels under a thick and a thin outline of the ellipse, reusing the mask buffer
+        contour_mask.fill(0)
+        cv2.drawContours(contour_mask, [contour], -1, (255), 1)
+        total_border_pixels = cv2.countNonZero(contour_mask)
+
+        mask.fill(0)
+        cv2.ellipse(mask, ellipse, (255), 10) #capture more for absolute
+        absolute_pixel_total_thick = cv2.countNonZero(cv2.bitwise_and(contour_mask, mask, dst=mask))
+
+        mask.fill(0)
+        cv2.ellipse(mask, ellipse, (255), 4) #capture fewer for ratio
+        overlap_thin = cv2.bitwise_and(contour_mask, mask)
+        absolute_pixel_total_thin = cv2.countNonZero(overlap_thin)
+
+        ratio_under_ellipse = absolute_pixel_total_thin / total_border_pixels if total_border_pixels > 0 else 0
+
+        return ellipse_goodness, [absolute_pixel_total_thick, ratio_under_ellipse, overlap_thin]
\ No newline at end of file
@@ -7,7 +7,7 @@ from PyQt6.QtWidgets import (
     QPushButton, QLabel, QMessageBox, QStatusBar, QHBoxLayout,
     QFrame,QSizePolicy
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, pyqtSlot
 from PyQt6.QtGui import QIcon, QAction, QKeySequence, QGuiApplication
 
 from app.gui.calibration_view import CalibrationView
@@ -357,6 +357,7 @@ class MainWindow(QMainWindow):
                                     external_power_mode_slot=self.on_power_mode_changed)
         self.help_popup.show()
     
+    @pyqtSlot(str)
     def on_power_mode_changed(self, mode):
         """Handle power mode changes from the help popup."""
         self.current_power_mode = mode
@@ -1,5 +1,96 @@
 from PyQt6 import QtCore, QtWidgets
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, pyqtSlot
+
+# Description shown under each power mode radio button, built once at import
+POWER_MODE_DESCRIPTIONS = {
+    'low': "• Minimal CPU usage\n• Basic tracking algorithm\n• Recommended for older systems",
+    'medium': "• Balanced performance and accuracy\n• Standard tracking algorithm\n• Recommended for most systems",
+    'high': "• Maximum precision and features\n• Advanced tracking algorithm\n• Requires powerful hardware",
+}
+
+# One stylesheet for the whole popup, child widgets are styled through their object names and roles
+ADVANCED_SETTINGS_STYLESHEET = '''
+    AdvancedSettingsPopup {
+        background: rgba(0, 0, 0, 128);
+    }
+    QWidget#container {
+        border: 2px solid #34495e;
+        border-radius: 12px;
+        background: white;
+    }
+    QLabel#title {
+        font-size: 22pt;
+        font-weight: bold;
+        color: #2c3e50;
+    }
+    QPushButton#close {
+        color: white;
+        font-weight: bold;
+        font-size: 14px;
+        background-color: #e74c3c;
+        border: none;
+        border-radius: 15px;
+        width: 30px;
+        height: 30px;
+    }
+    QPushButton#close:hover {
+        background-color: #c0392b;
+    }
+    QPushButton#apply {
+        background-color: #27ae60;
+        color: white;
+        border: none;
+        padding: 10px 24px;
+        border-radius: 6px;
+        font-weight: bold;
+        font-size: 14px;
+    }
+    QPushButton#apply:hover {
+        background-color: #219a52;
+    }
+    QLabel#sectionTitle {
+        font-size: 16px;
+        font-weight: bold;
+        color: #2c3e50;
+        margin-bottom: 10px;
+    }
+    QLabel#sectionDescription {
+        font-size: 12px;
+        color: #7f8c8d;
+        margin-bottom: 15px;
+        line-height: 1.3;
+    }
+    QGroupBox#powerGroup {
+        border: 1px solid #bdc3c7;
+        border-radius: 6px;
+        margin-top: 10px;
+        padding-top: 10px;
+        background: #f8f9fa;
+    }
+    QRadioButton {
+        font-weight: bold;
+        spacing: 8px;
+    }
+    QRadioButton::indicator {
+        width: 16px;
+        height: 16px;
+    }
+    QRadioButton#lowPowerRadio {
+        color: #27ae60;
+    }
+    QRadioButton#mediumPowerRadio {
+        color: #f39c12;
+    }
+    QRadioButton#highPowerRadio {
+        color: #e74c3c;
+    }
+    QLabel[role="desc"] {
+        font-size: 11px;
+        color: #7f8c8d;
+        margin-left: 25px;
+        margin-bottom: 8px;
+    }
+'''
 
 class AdvancedSettingsPopup(QtWidgets.QWidget):
     """Advanced Settings Popup for power optimization and other advanced features."""
@@ -7,42 +98,25 @@ class AdvancedSettingsPopup(QtWidgets.QWidget):
     # Signal emitted when power mode changes
     power_mode_changed = pyqtSignal(str)  # Emits 'low', 'medium', or 'high'
 
+    # Power modes in button group id order, and the reverse lookup
+    POWER_MODES = ('low', 'medium', 'high')
+    POWER_MODE_IDS = {mode: mode_id for mode_id, mode in enumerate(POWER_MODES)}
+
     def __init__(self, parent, current_power_mode="high"):
         super().__init__(parent)
+        # Fill the parent once here, eventFilter keeps it sized on later parent resizes
+        self.setGeometry(parent.rect())
         self.current_power_mode = current_power_mode
-        self.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose)
+        # The power section is only built the first time the popup is shown
+        self._built = False
+        # Parent resizes are coalesced into one setGeometry per event loop pass
+        self._resize_pending = False
+        self._pending_rect = None
+        # Not deleted on close, HelpPopup keeps one instance per parent and shows it again
         self.setAttribute(QtCore.Qt.WidgetAttribute.WA_StyledBackground)
         self.setAutoFillBackground(True)
 
-        # StyleSheet remains unchanged
-        self.setStyleSheet('''
-            AdvancedSettingsPopup {
-                background: rgba(0, 0, 0, 128);
-            }
-            QWidget#container {
-                border: 2px solid #34495e;
-                border-radius: 12px;
-                background: white;
-            }
-            QLabel#title {
-                font-size: 22pt;
-                font-weight: bold;
-                color: #2c3e50;
-            }
-            QPushButton#close {
-                color: white;
-                font-weight: bold;
-                font-size: 14px;
-                background-color: #e74c3c;
-                border: none;
-                border-radius: 15px;
-                width: 30px;
-                height: 30px;
-            }
-            QPushButton#close:hover {
-                background-color: #c0392b;
-            }
-        ''')
+        self.setStyleSheet(ADVANCED_SETTINGS_STYLESHEET)
 
         # Outer layout with transparent background
         full_layout = QtWidgets.QVBoxLayout(self)
@@ -58,14 +132,14 @@ class AdvancedSettingsPopup(QtWidgets.QWidget):
             QtWidgets.QSizePolicy.Policy.Maximum
         )
 
-        layout = QtWidgets.QVBoxLayout(self.container)
+        # Single grid for the container: header on row 0, power section on rows 1 to 3, apply button on row 4
+        layout = QtWidgets.QGridLayout(self.container)
         layout.setContentsMargins(30, 30, 30, 20)
-        layout.setSpacing(25)
-
-        # --- Header Layout (Title + Close) ---
-        header_layout = QtWidgets.QHBoxLayout()
-        header_layout.setContentsMargins(0, 0, 0, 0)
+        layout.setVerticalSpacing(25)
+        layout.setColumnStretch(0, 1)
+        self.container_layout = layout
 
+        # --- Header (Title + Close) ---
         title = QtWidgets.QLabel("Advanced Settings", objectName='title')
         title.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
 
@@ -73,76 +147,38 @@ class AdvancedSettingsPopup(QtWidgets.QWidget):
         self.close_button.clicked.connect(self.close)
         self.close_button.setCursor(Qt.CursorShape.PointingHandCursor)
 
-        header_layout.addWidget(title)
-        header_layout.addStretch()
-        header_layout.addWidget(self.close_button)
+        layout.addWidget(title, 0, 0)
+        layout.addWidget(self.close_button, 0, 1, alignment=Qt.AlignmentFlag.AlignRight)
 
-        layout.addLayout(header_layout)
-
-        # --- Power Optimization Settings ---
-        self.setup_power_optimization_section(layout)
+        # --- Power Optimization Settings (rows 1 to 3, filled in by _build_once) ---
 
         # --- Apply Button ---
-        apply_button = QtWidgets.QPushButton("Apply")
+        apply_button = QtWidgets.QPushButton("Apply", objectName='apply')
         apply_button.clicked.connect(self.apply_settings)
         apply_button.setCursor(Qt.CursorShape.PointingHandCursor)
-        apply_button.setStyleSheet("""
-            QPushButton {
-                background-color: #27ae60;
-                color: white;
-                border: none;
-                padding: 10px 24px;
-                border-radius: 6px;
-                font-weight: bold;
-                font-size: 14px;
-            }
-            QPushButton:hover {
-                background-color: #219a52;
-            }
-        """)
 
         # Center the button using alignment
-        layout.addWidget(apply_button, alignment=Qt.AlignmentFlag.AlignHCenter)
+        layout.addWidget(apply_button, 4, 0, 1, 2, alignment=Qt.AlignmentFlag.AlignHCenter)
 
         parent.installEventFilter(self)
 
     def setup_power_optimization_section(self, layout):
-        """Setup the power optimization section with radio buttons and descriptions."""
+        """Setup the power optimization section with radio buttons and descriptions in rows 1 to 3 of the container grid."""
         
         # Section title
-        section_title = QtWidgets.QLabel("Power Optimization")
-        section_title.setStyleSheet("""
-            font-size: 16px;
-            font-weight: bold;
-            color: #2c3e50;
-            margin-bottom: 10px;
-        """)
-        layout.addWidget(section_title)
+        section_title = QtWidgets.QLabel("Power Optimization", objectName='sectionTitle')
+        layout.addWidget(section_title, 1, 0, 1, 2)
 
         # Description
         description = QtWidgets.QLabel(
             "Select the computational intensity level for the eye tracking algorithm. "
-            "Lower power modes reduce CPU usage but may affect tracking precision.")
+            "Lower power modes reduce CPU usage but may affect tracking precision.",
+            objectName='sectionDescription')
         description.setWordWrap(True)
-        description.setStyleSheet("""
-            font-size: 12px;
-            color: #7f8c8d;
-            margin-bottom: 15px;
-            line-height: 1.3;
-        """)
-        layout.addWidget(description)
+        layout.addWidget(description, 2, 0, 1, 2)
 
         # Power mode selection group
-        power_group = QtWidgets.QGroupBox()
-        power_group.setStyleSheet("""
-            QGroupBox {
-                border: 1px solid #bdc3c7;
-                border-radius: 6px;
-                margin-top: 10px;
-                padding-top: 10px;
-                background: #f8f9fa;
-            }
-        """)
+        power_group = QtWidgets.QGroupBox(objectName='powerGroup')
         power_layout = QtWidgets.QVBoxLayout(power_group)
         power_layout.setSpacing(12)
 
@@ -150,110 +186,73 @@ class AdvancedSettingsPopup(QtWidgets.QWidget):
         self.power_mode_group = QtWidgets.QButtonGroup()
         
         # Low Power Mode
-        self.low_power_radio = QtWidgets.QRadioButton("Low Power Mode")
-        self.low_power_radio.setStyleSheet("""
-            QRadioButton {
-                font-weight: bold;
-                color: #27ae60;
-                spacing: 8px;
-            }
-            QRadioButton::indicator {
-                width: 16px;
-                height: 16px;
-            }
-        """)
+        self.low_power_radio = QtWidgets.QRadioButton("Low Power Mode", objectName='lowPowerRadio')
         power_layout.addWidget(self.low_power_radio)
         
-        low_power_desc = QtWidgets.QLabel("• Minimal CPU usage\n• Basic tracking algorithm\n• Recommended for older systems")
-        low_power_desc.setStyleSheet("""
-            font-size: 11px;
-            color: #7f8c8d;
-            margin-left: 25px;
-            margin-bottom: 8px;
-        """)
+        low_power_desc = QtWidgets.QLabel(POWER_MODE_DESCRIPTIONS['low'])
+        low_power_desc.setProperty('role', 'desc')
         power_layout.addWidget(low_power_desc)
 
         # Medium Power Mode
-        self.medium_power_radio = QtWidgets.QRadioButton("Medium Power Mode")
-        self.medium_power_radio.setStyleSheet("""
-            QRadioButton {
-                font-weight: bold;
-                color: #f39c12;
-                spacing: 8px;
-            }
-            QRadioButton::indicator {
-                width: 16px;
-                height: 16px;
-            }
-        """)
+        self.medium_power_radio = QtWidgets.QRadioButton("Medium Power Mode", objectName='mediumPowerRadio')
         power_layout.addWidget(self.medium_power_radio)
         
-        medium_power_desc = QtWidgets.QLabel("• Balanced performance and accuracy\n• Standard tracking algorithm\n• Recommended for most systems")
-        medium_power_desc.setStyleSheet("""
-            font-size: 11px;
-            color: #7f8c8d;
-            margin-left: 25px;
-            margin-bottom: 8px;
-        """)
+        medium_power_desc = QtWidgets.QLabel(POWER_MODE_DESCRIPTIONS['medium'])
+        medium_power_desc.setProperty('role', 'desc')
         power_layout.addWidget(medium_power_desc)
 
         # High Power Mode
-        self.high_power_radio = QtWidgets.QRadioButton("High Power Mode")
-        self.high_power_radio.setStyleSheet("""
-            QRadioButton {
-                font-weight: bold;
-                color: #e74c3c;
-                spacing: 8px;
-            }
-            QRadioButton::indicator {
-                width: 16px;
-                height: 16px;
-            }
-        """)
+        self.high_power_radio = QtWidgets.QRadioButton("High Power Mode", objectName='highPowerRadio')
         power_layout.addWidget(self.high_power_radio)
         
-        high_power_desc = QtWidgets.QLabel("• Maximum precision and features\n• Advanced tracking algorithm\n• Requires powerful hardware")
-        high_power_desc.setStyleSheet("""
-            font-size: 11px;
-            color: #7f8c8d;
-            margin-left: 25px;
-            margin-bottom: 8px;
-        """)
+        high_power_desc = QtWidgets.QLabel(POWER_MODE_DESCRIPTIONS['high'])
+        high_power_desc.setProperty('role', 'desc')
         power_layout.addWidget(high_power_desc)
 
         # Add radio buttons to button group
-        self.power_mode_group.addButton(self.low_power_radio, 0)
-        self.power_mode_group.addButton(self.medium_power_radio, 1)
-        self.power_mode_group.addButton(self.high_power_radio, 2)
+        self.power_mode_group.addButton(self.low_power_radio, self.POWER_MODE_IDS['low'])
+        self.power_mode_group.addButton(self.medium_power_radio, self.POWER_MODE_IDS['medium'])
+        self.power_mode_group.addButton(self.high_power_radio, self.POWER_MODE_IDS['high'])
 
         # Set current selection
         self.set_current_power_mode(self.current_power_mode)
 
-        layout.addWidget(power_group)
+        layout.addWidget(power_group, 3, 0, 1, 2)
+
+    def _build_once(self):
+        """Build the power optimization section on the first show."""
+        if self._built:
+            return
+        # Set first, the setup selects the current mode through set_current_power_mode
+        self._built = True
+        self.setup_power_optimization_section(self.container_layout)
 
     def set_current_power_mode(self, mode):
         """Set the current power mode selection."""
-        mode_map = {
-            'low': self.low_power_radio,
-            'medium': self.medium_power_radio,
-            'high': self.high_power_radio
-        }
-        
-        if mode in mode_map:
-            mode_map[mode].setChecked(True)
-            self.current_power_mode = mode
+        if mode not in self.POWER_MODE_IDS:
+            return
+
+        self.current_power_mode = mode
+        # Otherwise picked up by setup_power_optimization_section when the section is built
+        if self._built:
+            self.power_mode_group.button(self.POWER_MODE_IDS[mode]).setChecked(True)
 
     def get_selected_power_mode(self):
         """Get the currently selected power mode."""
-        if self.low_power_radio.isChecked():
-            return 'low'
-        elif self.medium_power_radio.isChecked():
-            return 'medium'
-        elif self.high_power_radio.isChecked():
-            return 'high'
+        if not self._built:
+            return self.current_power_mode
+        # checkedId is -1 when no button is checked
+        mode_id = self.power_mode_group.checkedId()
+        if 0 <= mode_id < len(self.POWER_MODES):
+            return self.POWER_MODES[mode_id]
         return 'medium'  # Default fallback
 
+    @pyqtSlot()
     def apply_settings(self):
+        if not self._built:
+            self.close()
+            return
+
         selected_mode = self.get_selected_power_mode()
         if selected_mode != self.current_power_mode:
             self.power_mode_changed.emit(selected_mode)
@@ -262,8 +261,9 @@ class AdvancedSettingsPopup(QtWidgets.QWidget):
         self.close()
 
     def showEvent(self, event):
-        """Make popup fill the entire parent."""
-        self.setGeometry(self.parent().rect())
+        """Build the power section on first show."""
+        self._build_once()
+        super().showEvent(event)
 
     def resizeEvent(self, event):
         """Position close button at top-right of container."""
@@ -274,7 +274,16 @@ class AdvancedSettingsPopup(QtWidgets.QWidget):
             self.close_button.setGeometry(button_rect)
 
     def eventFilter(self, source, event):
-        """Keep popup sized to match parent."""
+        """Keep popup sized to match parent, only the last resize of a drag is applied."""
         if event.type() == QtCore.QEvent.Type.Resize:
-            self.setGeometry(source.rect())
-        return super().eventFilter(source, event)
\ No newline at end of file
+            self._pending_rect = source.rect()
+            if not self._resize_pending:
+                self._resize_pending = True
+                QtCore.QTimer.singleShot(0, self._apply_pending_geometry)
+        return super().eventFilter(source, event)
+
+    @pyqtSlot()
+    def _apply_pending_geometry(self):
+        """Apply the latest parent rect recorded by eventFilter."""
+        self._resize_pending = False
+        self.setGeometry(self._pending_rect)
\ No newline at end of file
@@ -1,9 +1,138 @@
 from PyQt6 import QtCore, QtWidgets
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, pyqtSlot
 
 # Import the new AdvancedSettingsPopup
 from app.gui.widgets.adv_setting_popup import AdvancedSettingsPopup
 
+# Popup titles and rich text help per phase, built once at import and shared by every popup
+HELP_TITLES = {
+    "start": "EyeTracker Help",
+    "calib": "Calibration Help",
+    "test": "Test Instructions",
+    "results": "Results Help"
+}
+
+HELP_CONTENT = {
+    "start": """
+        <h3>Getting Started</h3>
+        <p><b>Step 1:</b> Connect your Arduino device via USB</p>
+        <p><b>Step 2:</b> Connect your eye tracking camera</p>
+        <p><b>Step 3:</b> Click "Connect Devices" to initialize hardware</p>
+
+        <h3>Calibration</h3> 
+        <p>• Position the patient comfortably in front of the screen</p>
+        <p>• Use the calibration view to set up eye tracking</p>
+        <p>• Adjust sensitivity settings for optimal tracking</p>
+
+        <h3>Running Tests</h3>
+        <p>• Follow the on-screen instructions during tests</p>
+        <p>• Monitor the status bar for real-time feedback</p>
+        <p>• Review results in the Results view after completion</p>
+
+        <h3>Troubleshooting</h3>
+        <p>• Check all USB connections if devices aren't detected</p>
+        <p>• Ensure proper lighting for eye tracking</p>
+        <p>• Restart the application if tracking becomes unstable</p>
+    """,
+
+    "calib": """
+        <h3>Calibration Instructions</h3>
+        <p><b>Step 1:</b> Instruct the patient to look at the centerpoint.</p>
+        <p><b>Step 2:</b> Position the subject so their eye is in the center of the frame</p>
+        <p><b>Step 3:</b> Adjust the zoom slider, to increase the image zoom. Drag yellow focus box to re-position.</p>
+        <p><b>Step 4:</b> Once pupil is accurately and consistently dected, click 'Set Position Button'.</p>
+        <p><b>Step 5:</b> If user's pupil deviates from set position, bound colour will change from green to blue.</p>
+        <p><b>Step 6:</b> Adjust the threshold slider if needed to increase or decrease deviation allowance.</p>
+        <p><b>Step 7:</b> Click 'Start Test' when calibration is complete.</p>
+
+        <h3>Tips</h3>
+        <p>• Ensure good lighting on the subject's face and pupil</p>
+        <p>• The eye should be clearly visible and centered, ensure that the pupil only takes up 20%\ of the screen </p>
+        <p>• Use 'up', 'down', 'left', 'right' keys to shift zoom box, 'Enter' to select zoom and 'Escape' to reset zoom</p>
+        <p>• Use 'L' to set position of pupil</p>
+        <p>• Adjust threshold slider to increase or decrease sensitivity to pupil movement</p>
+    """,
+
+    "test": """
+        <h3>Test Instructions</h3>
+        <p>During the test, follow these guidelines:</p>
+        <p>• Keep your head still and look naturally</p>
+        <p>• Follow the on-screen prompts</p>
+        <p>• Try to blink normally</p>
+        <p>• Alert the operator if you feel uncomfortable</p>
+
+        <h3>What to Expect</h3>
+        <p>• The test will track your eye movements</p>
+        <p>• You will see visual stimuli to follow</p>
+        <p>• The test duration varies by protocol</p>
+    """,
+
+    "results": """
+        <h3>Understanding Results</h3>
+        <p>The results section displays:</p>
+        <p>• Eye movement data and statistics</p>
+        <p>• Visual representations of tracking</p>
+        <p>• Analysis metrics and measurements</p>
+
+        <h3>Export Options</h3>
+        <p>• Save results to file for further analysis</p>
+        <p>• Print summary reports</p>
+        <p>• Export raw data for external processing</p>
+    """
+}
+
+
+# Stylesheet for the popup and its children, parsed from the same string by every popup
+HELP_POPUP_STYLESHEET = '''
+    HelpPopup {
+        background: rgba(0, 0, 0, 128);
+    }
+    QWidget#container {
+        border: 2px solid #34495e;
+        border-radius: 8px;
+        background: white;
+    }
+    QWidget#container > QLabel {
+        color: #2c3e50;
+    }
+    QLabel#title {
+        font-size: 20pt;
+        font-weight: bold;
+        color: #2c3e50;
+    }
+    QPushButton#close {
+        color: white;
+        font-weight: bold;
+        font-size: 16px; 
+        background-color: #e74c3c;
+        border: none;
+        border-radius: 4px;
+    }
+    QPushButton#close:hover {
+        background-color: #c0392b;
+    }
+    QLabel#helpText {
+        font-size: 12px;
+        line-height: 1.4;
+        color: #34495e;
+        background: #f8f9fa;
+        padding: 15px;
+        border-radius: 4px;
+    }
+    QPushButton#ok {
+        background-color: #3498db;
+        color: white;
+        border: none;
+        padding: 8px 20px;
+        border-radius: 4px;
+        font-weight: bold;
+    }
+    QPushButton#ok:hover {
+        background-color: #2980b9;
+    }
+'''
+
+
 class HelpPopup(QtWidgets.QWidget):
     """Help Popup Content for all screens, renders differently based on current test stage."""
     
@@ -12,40 +141,17 @@ class HelpPopup(QtWidgets.QWidget):
     
     def __init__(self, parent, phase="start", current_power_mode="medium", external_power_mode_slot=None):
         super().__init__(parent)
+        # Fill the parent once here, eventFilter keeps it sized on later parent resizes
+        self.setGeometry(parent.rect())
         self.current_power_mode = current_power_mode
         self.external_power_mode_slot = external_power_mode_slot
+        # Parent resizes are coalesced into one setGeometry per event loop pass
+        self._resize_pending = False
+        self._pending_rect = None
         self.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose)
         self.setAttribute(QtCore.Qt.WidgetAttribute.WA_StyledBackground)
         self.setAutoFillBackground(True)
-        self.setStyleSheet('''
-            HelpPopup {
-                background: rgba(0, 0, 0, 128);
-            }
-            QWidget#container {
-                border: 2px solid #34495e;
-                border-radius: 8px;
-                background: white;
-            }
-            QWidget#container > QLabel {
-                color: #2c3e50;
-            }
-            QLabel#title {
-                font-size: 20pt;
-                font-weight: bold;
-                color: #2c3e50;
-            }
-            QPushButton#close {
-                color: white;
-                font-weight: bold;
-                font-size: 16px; 
-                background-color: #e74c3c;
-                border: none;
-                border-radius: 4px;
-            }
-            QPushButton#close:hover {
-                background-color: #c0392b;
-            }
-        ''')
+        self.setStyleSheet(HELP_POPUP_STYLESHEET)
 
         # Full layout for the popup
         full_layout = QtWidgets.QVBoxLayout(self)
@@ -55,10 +161,11 @@ class HelpPopup(QtWidgets.QWidget):
         self.container = QtWidgets.QWidget(objectName='container')
         full_layout.addWidget(self.container, alignment=Qt.AlignmentFlag.AlignCenter)
 
-        # Container layout
-        layout = QtWidgets.QVBoxLayout(self.container)
+        # Single grid for the container: close button, title, help text, then the action buttons
+        layout = QtWidgets.QGridLayout(self.container)
         layout.setContentsMargins(30, 30, 30, 30)
         layout.setSpacing(15)
+        layout.setColumnStretch(0, 1)
 
         # Close button
         self.close_button = QtWidgets.QPushButton('X', self.container, objectName='close')
@@ -67,74 +174,57 @@ class HelpPopup(QtWidgets.QWidget):
         self.close_button.clicked.connect(self.close)
 
         # Add close button at top-right
-        top_button_layout = QtWidgets.QHBoxLayout()
-        top_button_layout.setContentsMargins(0, 0, 0, 0)
-        top_button_layout.addStretch()
-        top_button_layout.addWidget(self.close_button)
-        layout.addLayout(top_button_layout, stretch=0)
+        layout.addWidget(self.close_button, 0, 1, alignment=Qt.AlignmentFlag.AlignRight)
 
         # Title
         title = QtWidgets.QLabel(self._get_title(phase), objectName='title')
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(title)
+        layout.addWidget(title, 1, 0, 1, 2)
 
         # Help content
         help_content = self._get_help_content(phase)
-        help_text = QtWidgets.QLabel(help_content)
+        help_text = QtWidgets.QLabel(help_content, objectName='helpText')
         help_text.setWordWrap(True)
         help_text.setTextFormat(QtCore.Qt.TextFormat.RichText)
-        help_text.setStyleSheet("""
-            font-size: 12px;
-            line-height: 1.4;
-            color: #34495e;
-            background: #f8f9fa;
-            padding: 15px;
-            border-radius: 4px;
-        """)
-        layout.addWidget(help_text)
-
-        # Button layout (bottom)
-        button_layout = QtWidgets.QHBoxLayout()
+        layout.addWidget(help_text, 2, 0, 1, 2)
+
+        # Buttons (bottom), advanced on the left and ok on the right
         advanced_button = QtWidgets.QPushButton("Advanced Settings")
         advanced_button.clicked.connect(self.show_advanced_settings)
 
-        ok_button = QtWidgets.QPushButton("Got it!")
+        ok_button = QtWidgets.QPushButton("Got it!", objectName='ok')
         ok_button.clicked.connect(self.close)
-        ok_button.setStyleSheet("""
-            QPushButton {
-                background-color: #3498db;
-                color: white;
-                border: none;
-                padding: 8px 20px;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #2980b9;
-            }
-        """)
-
-        button_layout.addWidget(advanced_button)
-        button_layout.addStretch()
-        button_layout.addWidget(ok_button)
-        layout.addLayout(button_layout)
+
+        layout.addWidget(advanced_button, 3, 0, alignment=Qt.AlignmentFlag.AlignLeft)
+        layout.addWidget(ok_button, 3, 1, alignment=Qt.AlignmentFlag.AlignRight)
 
         # Track resize of parent
         parent.installEventFilter(self)
 
+    @pyqtSlot()
     def show_advanced_settings(self):
         """Show the advanced settings popup and close this help popup."""
         self.close()  # Close the help popup first
         
-        # Create and show the advanced settings popup
-        self.advanced_popup = AdvancedSettingsPopup(self.parent(), self.current_power_mode)
+        # Reuse the advanced settings popup cached on the parent, it is a Qt child of the
+        # parent so it is released together with it
+        parent = self.parent()
+        popup = getattr(parent, '_adv_popup', None)
+        if popup is None:
+            popup = AdvancedSettingsPopup(parent, self.current_power_mode)
 
-        # Connect the power mode changed signal to pass it up
-        if self.external_power_mode_slot:
-            self.advanced_popup.power_mode_changed.connect(self.external_power_mode_slot)
-        
-        self.advanced_popup.show()
+            # Connect the power mode changed signal to pass it up
+            if self.external_power_mode_slot:
+                popup.power_mode_changed.connect(self.external_power_mode_slot)
+            parent._adv_popup = popup
+        else:
+            popup.set_current_power_mode(self.current_power_mode)
+
+        self.advanced_popup = popup
+        popup.show()
+        popup.raise_()
 
+    @pyqtSlot(str)
     def on_power_mode_changed(self, mode):
         """Handle power mode changes and forward the signal."""
         self.current_power_mode = mode
@@ -144,90 +234,11 @@ class HelpPopup(QtWidgets.QWidget):
 
     def _get_title(self, phase):
         """Get the appropriate title for the help popup based on phase"""
-        titles = {
-            "start": "EyeTracker Help",
-            "calib": "Calibration Help",
-            "test": "Test Instructions",
-            "results": "Results Help"
-        }
-        return titles.get(phase, "Help")
+        return HELP_TITLES.get(phase, "Help")
 
     def _get_help_content(self, phase):
         """Get the appropriate help content based on the current phase"""
-        help_content_map = {
-            "start": """
-                <h3>Getting Started</h3>
-                <p><b>Step 1:</b> Connect your Arduino device via USB</p>
-                <p><b>Step 2:</b> Connect your eye tracking camera</p>
-                <p><b>Step 3:</b> Click "Connect Devices" to initialize hardware</p>
-                
-                <h3>Calibration</h3> 
-                <p>• Position the patient comfortably in front of the screen</p>
-                <p>• Use the calibration view to set up eye tracking</p>
-                <p>• Adjust sensitivity settings for optimal tracking</p>
-                
-                <h3>Running Tests</h3>
-                <p>• Follow the on-screen instructions during tests</p>
-                <p>• Monitor the status bar for real-time feedback</p>
-                <p>• Review results in the Results view after completion</p>
-                
-                <h3>Troubleshooting</h3>
-                <p>• Check all USB connections if devices aren't detected</p>
-                <p>• Ensure proper lighting for eye tracking</p>
-                <p>• Restart the application if tracking becomes unstable</p>
-            """,
-            
-            "calib": """
-                <h3>Calibration Instructions</h3>
-                <p><b>Step 1:</b> Instruct the patient to look at the centerpoint.</p>
-                <p><b>Step 2:</b> Position the subject so their eye is in the center of the frame</p>
-                <p><b>Step 3:</b> Adjust the zoom slider, to increase the image zoom. Drag yellow focus box to re-position.</p>
-                <p><b>Step 4:</b> Once pupil is accurately and consistently dected, click 'Set Position Button'.</p>
-                <p><b>Step 5:</b> If user's pupil deviates from set position, bound colour will change from green to blue.</p>
-                <p><b>Step 6:</b> Adjust the threshold slider if needed to increase or decrease deviation allowance.</p>
-                <p><b>Step 7:</b> Click 'Start Test' when calibration is complete.</p>
-                
-                <h3>Tips</h3>
-                <p>• Ensure good lighting on the subject's face and pupil</p>
-                <p>• The eye should be clearly visible and centered, ensure that the pupil only takes up 20%\ of the screen </p>
-                <p>• Use 'up', 'down', 'left', 'right' keys to shift zoom box, 'Enter' to select zoom and 'Escape' to reset zoom</p>
-                <p>• Use 'L' to set position of pupil</p>
-                <p>• Adjust threshold slider to increase or decrease sensitivity to pupil movement</p>
-            """,
-            
-            "test": """
-                <h3>Test Instructions</h3>
-                <p>During the test, follow these guidelines:</p>
-                <p>• Keep your head still and look naturally</p>
-                <p>• Follow the on-screen prompts</p>
-                <p>• Try to blink normally</p>
-                <p>• Alert the operator if you feel uncomfortable</p>
-                
-                <h3>What to Expect</h3>
-                <p>• The test will track your eye movements</p>
-                <p>• You will see visual stimuli to follow</p>
-                <p>• The test duration varies by protocol</p>
-            """,
-            
-            "results": """
-                <h3>Understanding Results</h3>
-                <p>The results section displays:</p>
-                <p>• Eye movement data and statistics</p>
-                <p>• Visual representations of tracking</p>
-                <p>• Analysis metrics and measurements</p>
-                
-                <h3>Export Options</h3>
-                <p>• Save results to file for further analysis</p>
-                <p>• Print summary reports</p>
-                <p>• Export raw data for external processing</p>
-            """
-        }
-        
-        return help_content_map.get(phase, "<p>No help available for this section.</p>")
-
-    def showEvent(self, event):
-        # Make popup fill the entire parent
-        self.setGeometry(self.parent().rect())
+        return HELP_CONTENT.get(phase, "<p>No help available for this section.</p>")
 
     # def resizeEvent(self, event):
     #     # Position close button at top-right of container
@@ -238,7 +249,15 @@ class HelpPopup(QtWidgets.QWidget):
     #         self.close_button.setGeometry(button_rect)
 
     def eventFilter(self, source, event):
-        # Keep popup sized to match parent
+        # Keep popup sized to match parent, only the last resize of a drag is applied
         if event.type() == QtCore.QEvent.Type.Resize:
-            self.setGeometry(source.rect())
-        return super().eventFilter(source, event)
\ No newline at end of file
+            self._pending_rect = source.rect()
+            if not self._resize_pending:
+                self._resize_pending = True
+                QtCore.QTimer.singleShot(0, self._apply_pending_geometry)
+        return super().eventFilter(source, event)
+
+    @pyqtSlot()
+    def _apply_pending_geometry(self):
+        self._resize_pending = False
+        self.setGeometry(self._pending_rect)
\ No newline at end of file
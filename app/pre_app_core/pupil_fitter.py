@@ -1,7 +1,6 @@
 import cv2
 import numpy as np
 import math
-import tkinter as tk
 import os
 import time
 import tracker
@@ -645,6 +644,8 @@ def lockpos(frame, final_contours, euclid_dist, lockpos_threshold, arduino_deets
 
 import os
 def select_video():
+    # Imported here, tkinter is only needed for this debugging helper
+    import tkinter as tk
     root = tk.Tk()
     root.withdraw()  # Hide the main window
 